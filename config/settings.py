@@ -19,11 +19,74 @@ class Settings:
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///giveaway_bot.db')
     SECRET_KEY = os.getenv('SECRET_KEY', 'default_secret_key_change_this')
 
+    # Получение обновлений: polling или webhook
+    RUN_MODE = os.getenv('RUN_MODE', 'polling').lower()
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')  # публичный https-адрес, например https://bot.example.com
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN') or None
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL') or None  # по умолчанию api.telegram.org
+
+    # Сколько обновлений обрабатывается одновременно (обновления одного пользователя - по очереди)
+    MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '64'))
+
+    # Как часто (секунд) user_data и chat_data сохраняются в базу
+    PERSISTENCE_UPDATE_INTERVAL = float(os.getenv('PERSISTENCE_UPDATE_INTERVAL', '30'))
+    # Сколько прочитанных строк состояния (пользователей, чатов) помнить в памяти
+    PERSISTENCE_CACHE_SIZE = int(os.getenv('PERSISTENCE_CACHE_SIZE', '10000'))
+    PERSISTENCE_CACHE_TTL = float(os.getenv('PERSISTENCE_CACHE_TTL', '3600'))
+
+    # Настройки базы данных
+    DB_POOL_READERS = int(os.getenv('DB_POOL_READERS', '4'))
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+    DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+    DB_CACHE_SIZE = int(os.getenv('DB_CACHE_SIZE', '-65536'))  # в КиБ, 64 МБ
+    DB_WRITE_BATCH_SIZE = int(os.getenv('DB_WRITE_BATCH_SIZE', '500'))
+
+    # Кэш строк розыгрышей
+    GIVEAWAY_CACHE_SIZE = int(os.getenv('GIVEAWAY_CACHE_SIZE', '1024'))
+    GIVEAWAY_CACHE_TTL = float(os.getenv('GIVEAWAY_CACHE_TTL', '60'))
+
+    # Недавно виденные пользователи: повторный /start без изменений профиля не пишет в БД
+    SEEN_USERS_CACHE_SIZE = int(os.getenv('SEEN_USERS_CACHE_SIZE', '100000'))
+    SEEN_USERS_CACHE_TTL = float(os.getenv('SEEN_USERS_CACHE_TTL', '86400'))
+
+    # Проверка подписок на каналы
+    SUBSCRIPTION_CHECK_CONCURRENCY = int(os.getenv('SUBSCRIPTION_CHECK_CONCURRENCY', '20'))
+    SUBSCRIPTION_CACHE_SIZE = int(os.getenv('SUBSCRIPTION_CACHE_SIZE', '50000'))
+    SUBSCRIPTION_CACHE_TTL = float(os.getenv('SUBSCRIPTION_CACHE_TTL', '300'))
+
     # Настройки бота
     MAX_GIVEAWAY_NAME_LENGTH = 80
     MAX_PARTICIPANTS_DEFAULT = 1000
     MAX_MEDIA_FILES = 10
 
+    # С какого числа участников розыгрыш проводится в отдельном процессе
+    DRAW_PROCESS_THRESHOLD = int(os.getenv('DRAW_PROCESS_THRESHOLD', '50000'))
+    DRAW_PROCESS_WORKERS = int(os.getenv('DRAW_PROCESS_WORKERS', '1'))
+
+    # Экспорт участников
+    EXPORT_CHUNK_SIZE = 5000
+    EXPORT_SPOOL_MAX_SIZE = 8 * 1024 * 1024  # больше - временный файл на диске
+    EXPORT_MAX_DOCUMENT_SIZE = 50 * 1024 * 1024  # лимит Bot API на отправку файлов
+
+    # График роста участников: сколько последних часов показывать
+    GROWTH_CHART_HOURS = int(os.getenv('GROWTH_CHART_HOURS', '168'))
+    GROWTH_CHART_CACHE_SIZE = int(os.getenv('GROWTH_CHART_CACHE_SIZE', '256'))
+
+    # Кнопка участия: счетчик на ней обновляется не чаще раза в интервал (секунд)
+    BUTTON_UPDATE_INTERVAL = float(os.getenv('BUTTON_UPDATE_INTERVAL', '3.0'))
+
+    # Рассылка сообщений (уведомления победителей и др.)
+    BROADCAST_WORKERS = int(os.getenv('BROADCAST_WORKERS', '8'))
+    BROADCAST_GLOBAL_RATE = float(os.getenv('BROADCAST_GLOBAL_RATE', '25'))  # сообщений в секунду
+    BROADCAST_PER_CHAT_INTERVAL = float(os.getenv('BROADCAST_PER_CHAT_INTERVAL', '1.0'))  # секунд
+    BROADCAST_MAX_ATTEMPTS = int(os.getenv('BROADCAST_MAX_ATTEMPTS', '5'))
+    BROADCAST_POLL_INTERVAL = 5.0
+    BROADCAST_RETENTION_DAYS = int(os.getenv('BROADCAST_RETENTION_DAYS', '7'))  # хранение доставленных и недоставленных
+
     # Сообщения
     MESSAGES = {
         'welcome_admin': "🤖 Добро пожаловать, {name}!\n\nВы вошли как администратор.\nВыберите действие:",
@@ -68,6 +131,11 @@ class Settings:
         if not cls.ADMIN_USER_ID or cls.ADMIN_USER_ID == 0:
             errors.append("ADMIN_USER_ID не установлен или некорректен")
 
+        if cls.RUN_MODE not in ('polling', 'webhook'):
+            errors.append("RUN_MODE должен быть polling или webhook")
+        elif cls.RUN_MODE == 'webhook' and not cls.WEBHOOK_URL:
+            errors.append("WEBHOOK_URL не установлен (обязателен в режиме webhook)")
+
         return errors
 
 
@@ -0,0 +1,317 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Пересчет сводной статистики администраторов с нуля (миграция 6 и /recount)
+REBUILD_STATISTICS = [
+    'DELETE FROM admin_participants',
+    'DELETE FROM admin_stats',
+    '''
+    INSERT INTO admin_participants (admin_id, user_id, giveaways_count)
+    SELECT g.admin_id, p.user_id, COUNT(*)
+    FROM participants p
+    JOIN giveaways g ON g.id = p.giveaway_id
+    WHERE g.admin_id IS NOT NULL
+    GROUP BY g.admin_id, p.user_id
+    ''',
+    '''
+    INSERT INTO admin_stats (
+        admin_id, total_giveaways, finished_giveaways,
+        total_participations, giveaways_with_participants, distinct_participants
+    )
+    SELECT admin_id,
+           COUNT(*),
+           SUM(status = 'finished'),
+           SUM(participants_count),
+           SUM(participants_count > 0),
+           (SELECT COUNT(*) FROM admin_participants ap WHERE ap.admin_id = giveaways.admin_id)
+    FROM giveaways
+    WHERE admin_id IS NOT NULL
+    GROUP BY admin_id
+    ''',
+]
+
+# Миграции схемы: номер версии -> список SQL-выражений.
+# Примененная версия хранится в PRAGMA user_version.
+MIGRATIONS = {
+    1: [
+        # Мои розыгрыши: WHERE admin_id = ? ORDER BY created_at DESC
+        '''
+        CREATE INDEX IF NOT EXISTS idx_giveaways_admin_created
+        ON giveaways (admin_id, created_at DESC)
+        ''',
+        # Участники розыгрыша в порядке регистрации (розыгрыш, экспорт)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_participants_giveaway_joined
+        ON participants (giveaway_id, joined_at)
+        ''',
+        # Мои участия: WHERE user_id = ? ORDER BY joined_at DESC
+        '''
+        CREATE INDEX IF NOT EXISTS idx_participants_user_joined
+        ON participants (user_id, joined_at DESC, giveaway_id)
+        ''',
+        # Мои победы и get_winner_info: WHERE user_id = ? ORDER BY selected_at DESC
+        '''
+        CREATE INDEX IF NOT EXISTS idx_winners_user_selected
+        ON winners (user_id, selected_at DESC)
+        ''',
+        # Удаление и выборка победителей розыгрыша
+        '''
+        CREATE INDEX IF NOT EXISTS idx_winners_giveaway_place
+        ON winners (giveaway_id, place)
+        ''',
+    ],
+    2: [
+        # Денормализованный счетчик участников
+        '''
+        ALTER TABLE giveaways ADD COLUMN participants_count INTEGER NOT NULL DEFAULT 0
+        ''',
+        '''
+        UPDATE giveaways SET participants_count = (
+            SELECT COUNT(*) FROM participants WHERE participants.giveaway_id = giveaways.id
+        )
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_participants_count_insert
+        AFTER INSERT ON participants
+        BEGIN
+            UPDATE giveaways SET participants_count = participants_count + 1
+            WHERE id = NEW.giveaway_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_participants_count_delete
+        AFTER DELETE ON participants
+        BEGIN
+            UPDATE giveaways SET participants_count = participants_count - 1
+            WHERE id = OLD.giveaway_id;
+        END
+        ''',
+    ],
+    3: [
+        # Очередь исходящих сообщений (рассылки, уведомления)
+        '''
+        CREATE TABLE IF NOT EXISTS outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            batch_id TEXT,
+            chat_id INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            parse_mode TEXT,
+            reply_markup TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            sent_at TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+        ON outbox (status, priority DESC, id, next_attempt_at)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_outbox_batch
+        ON outbox (batch_id, status)
+        ''',
+    ],
+    4: [
+        # Постраничный просмотр «Мои розыгрыши» по ключу (created_at, id)
+        '''
+        CREATE INDEX IF NOT EXISTS idx_giveaways_admin_created_id
+        ON giveaways (admin_id, created_at DESC, id DESC)
+        ''',
+        'DROP INDEX IF EXISTS idx_giveaways_admin_created',
+    ],
+    5: [
+        # Состояние обработчиков (user_data, chat_data, bot_data, диалоги):
+        # строка JSON на каждого пользователя/чат
+        '''
+        CREATE TABLE IF NOT EXISTS persistence (
+            kind TEXT NOT NULL,
+            key TEXT NOT NULL,
+            data TEXT NOT NULL,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (kind, key)
+        ) WITHOUT ROWID
+        ''',
+    ],
+    6: [
+        # Сводная статистика администратора, поддерживается триггерами
+        '''
+        CREATE TABLE IF NOT EXISTS admin_stats (
+            admin_id INTEGER PRIMARY KEY,
+            total_giveaways INTEGER NOT NULL DEFAULT 0,
+            finished_giveaways INTEGER NOT NULL DEFAULT 0,
+            total_participations INTEGER NOT NULL DEFAULT 0,
+            giveaways_with_participants INTEGER NOT NULL DEFAULT 0,
+            distinct_participants INTEGER NOT NULL DEFAULT 0
+        )
+        ''',
+        # Уникальные участники розыгрышей администратора: число розыгрышей
+        # пользователя, строка удаляется при обнулении
+        '''
+        CREATE TABLE IF NOT EXISTS admin_participants (
+            admin_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            giveaways_count INTEGER NOT NULL,
+            PRIMARY KEY (admin_id, user_id)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_admin_participants_insert
+        AFTER INSERT ON admin_participants
+        BEGIN
+            UPDATE admin_stats SET distinct_participants = distinct_participants + 1
+            WHERE admin_id = NEW.admin_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_admin_participants_delete
+        AFTER DELETE ON admin_participants
+        BEGIN
+            UPDATE admin_stats SET distinct_participants = distinct_participants - 1
+            WHERE admin_id = OLD.admin_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_giveaway_insert
+        AFTER INSERT ON giveaways
+        WHEN NEW.admin_id IS NOT NULL
+        BEGIN
+            INSERT INTO admin_stats (admin_id, total_giveaways, finished_giveaways)
+            VALUES (NEW.admin_id, 1, NEW.status = 'finished')
+            ON CONFLICT(admin_id) DO UPDATE SET
+                total_giveaways = total_giveaways + 1,
+                finished_giveaways = finished_giveaways + (NEW.status = 'finished');
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_giveaway_status
+        AFTER UPDATE OF status ON giveaways
+        WHEN NEW.admin_id IS NOT NULL
+         AND (OLD.status = 'finished') != (NEW.status = 'finished')
+        BEGIN
+            UPDATE admin_stats
+            SET finished_giveaways = finished_giveaways + (NEW.status = 'finished') - (OLD.status = 'finished')
+            WHERE admin_id = NEW.admin_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_giveaway_participants
+        AFTER UPDATE OF participants_count ON giveaways
+        WHEN NEW.admin_id IS NOT NULL AND NEW.participants_count != OLD.participants_count
+        BEGIN
+            UPDATE admin_stats
+            SET total_participations = total_participations + NEW.participants_count - OLD.participants_count,
+                giveaways_with_participants = giveaways_with_participants
+                    + (NEW.participants_count > 0) - (OLD.participants_count > 0)
+            WHERE admin_id = NEW.admin_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_giveaway_delete
+        AFTER DELETE ON giveaways
+        WHEN OLD.admin_id IS NOT NULL
+        BEGIN
+            UPDATE admin_stats
+            SET total_giveaways = total_giveaways - 1,
+                finished_giveaways = finished_giveaways - (OLD.status = 'finished'),
+                total_participations = total_participations - OLD.participants_count,
+                giveaways_with_participants = giveaways_with_participants - (OLD.participants_count > 0)
+            WHERE admin_id = OLD.admin_id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_participant_insert
+        AFTER INSERT ON participants
+        BEGIN
+            INSERT INTO admin_participants (admin_id, user_id, giveaways_count)
+            SELECT admin_id, NEW.user_id, 1 FROM giveaways
+            WHERE id = NEW.giveaway_id AND admin_id IS NOT NULL
+            ON CONFLICT(admin_id, user_id) DO UPDATE SET giveaways_count = giveaways_count + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_stats_participant_delete
+        AFTER DELETE ON participants
+        BEGIN
+            UPDATE admin_participants SET giveaways_count = giveaways_count - 1
+            WHERE user_id = OLD.user_id
+              AND admin_id = (SELECT admin_id FROM giveaways WHERE id = OLD.giveaway_id);
+            DELETE FROM admin_participants
+            WHERE user_id = OLD.user_id
+              AND admin_id = (SELECT admin_id FROM giveaways WHERE id = OLD.giveaway_id)
+              AND giveaways_count <= 0;
+        END
+        ''',
+        *REBUILD_STATISTICS,
+    ],
+    7: [
+        # Число вступлений в розыгрыш по часам (UTC) для графика роста
+        '''
+        CREATE TABLE IF NOT EXISTS giveaway_hourly_joins (
+            giveaway_id TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            joins INTEGER NOT NULL,
+            PRIMARY KEY (giveaway_id, bucket)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_hourly_joins_insert
+        AFTER INSERT ON participants
+        WHEN NEW.joined_at IS NOT NULL
+        BEGIN
+            INSERT INTO giveaway_hourly_joins (giveaway_id, bucket, joins)
+            VALUES (NEW.giveaway_id, strftime('%Y-%m-%d %H:00:00', NEW.joined_at), 1)
+            ON CONFLICT(giveaway_id, bucket) DO UPDATE SET joins = joins + 1;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_hourly_joins_delete
+        AFTER DELETE ON participants
+        WHEN OLD.joined_at IS NOT NULL
+        BEGIN
+            UPDATE giveaway_hourly_joins SET joins = joins - 1
+            WHERE giveaway_id = OLD.giveaway_id
+              AND bucket = strftime('%Y-%m-%d %H:00:00', OLD.joined_at);
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_hourly_joins_giveaway_delete
+        AFTER DELETE ON giveaways
+        BEGIN
+            DELETE FROM giveaway_hourly_joins WHERE giveaway_id = OLD.id;
+        END
+        ''',
+        '''
+        INSERT OR REPLACE INTO giveaway_hourly_joins (giveaway_id, bucket, joins)
+        SELECT giveaway_id, strftime('%Y-%m-%d %H:00:00', joined_at), COUNT(*)
+        FROM participants
+        WHERE giveaway_id IS NOT NULL AND joined_at IS NOT NULL
+        GROUP BY giveaway_id, strftime('%Y-%m-%d %H:00:00', joined_at)
+        ''',
+    ],
+}
+
+
+async def apply_migrations(db) -> int:
+    """Применение недостающих миграций, возвращает текущую версию схемы"""
+    cursor = await db.execute('PRAGMA user_version')
+    current_version = (await cursor.fetchone())[0]
+
+    for version in sorted(MIGRATIONS):
+        if version <= current_version:
+            continue
+
+        logger.info(f"Применение миграции схемы №{version}")
+        for statement in MIGRATIONS[version]:
+            await db.execute(statement)
+
+        await db.execute(f'PRAGMA user_version = {int(version)}')
+        current_version = version
+
+    # Обновляем статистику планировщика для новых индексов
+    await db.execute('PRAGMA optimize')
+    return current_version
@@ -1,18 +1,57 @@
 import sqlite3
-import aiosqlite
 import json
 from datetime import datetime
-from typing import Optional, List, Dict
+from typing import AsyncIterator, Callable, Optional, List, Dict, NamedTuple, Tuple
 from config.settings import settings
+from database.migrations import REBUILD_STATISTICS, apply_migrations
+from database.outbox import insert_messages
+from database.pool import ConnectionPool
+from utils.cache import TTLCache
+
+
+class JoinStatus:
+    """Результаты попытки участия в розыгрыше"""
+    JOINED = 'joined'
+    ALREADY = 'already'
+    FULL = 'full'
+    INACTIVE = 'inactive'
+    NOT_FOUND = 'not_found'
+
+
+class JoinResult(NamedTuple):
+    """Результат участия; для JOINED participants_count - номер нового участника"""
+    status: str
+    participants_count: int = 0
+
+    @property
+    def joined(self) -> bool:
+        return self.status == JoinStatus.JOINED
 
 
 class DatabaseManager:
     def __init__(self, db_path: str = None):
         self.db_path = db_path or settings.DATABASE_URL.replace('sqlite:///', '')
+        self.admin_ids = {settings.ADMIN_USER_ID} if settings.ADMIN_USER_ID else set()
+        self.seen_users = TTLCache(settings.SEEN_USERS_CACHE_SIZE, settings.SEEN_USERS_CACHE_TTL)
+        self.giveaway_cache = TTLCache(settings.GIVEAWAY_CACHE_SIZE, settings.GIVEAWAY_CACHE_TTL)
+        self.pool = ConnectionPool(
+            self.db_path,
+            readers_count=settings.DB_POOL_READERS,
+            busy_timeout_ms=settings.DB_BUSY_TIMEOUT_MS,
+            mmap_size=settings.DB_MMAP_SIZE,
+            cache_size=settings.DB_CACHE_SIZE,
+            batch_size=settings.DB_WRITE_BATCH_SIZE
+        )
+
+    async def close(self):
+        """Закрытие соединений с базой данных"""
+        await self.pool.close()
 
     async def init_database(self):
         """Инициализация базы данных"""
-        async with aiosqlite.connect(self.db_path) as db:
+        await self.pool.open()
+
+        async with self.pool.write() as db:
             # Таблица пользователей
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS users (
@@ -95,40 +134,85 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?)
             ''', (settings.ADMIN_USER_ID, 'admin', 'Администратор', True))
 
-            await db.commit()
+            # Индексы и прочие изменения схемы
+            await apply_migrations(db)
+
+        await self.load_admins()
 
     async def add_user(self, user_data: Dict):
-        """Добавление пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Добавление или обновление пользователя.
+
+        Запись выполняется только для новых пользователей и при изменении профиля;
+        is_admin и created_at существующей записи не затрагиваются.
+        """
+        profile = (
+            user_data.get('username'),
+            user_data.get('first_name'),
+            user_data.get('last_name'),
+            user_data.get('language_code', 'ru')
+        )
+        profile_hash = hash(profile)
+
+        # Недавно виденный пользователь с тем же профилем - запись не нужна
+        if self.seen_users.get(user_data['user_id']) == profile_hash:
+            return
+
+        async with self.pool.write() as db:
             await db.execute('''
-                INSERT OR REPLACE INTO users 
+                INSERT INTO users
                 (user_id, username, first_name, last_name, language_code)
                 VALUES (?, ?, ?, ?, ?)
-            ''', (
-                user_data['user_id'],
-                user_data.get('username'),
-                user_data.get('first_name'),
-                user_data.get('last_name'),
-                user_data.get('language_code', 'ru')
-            ))
-            await db.commit()
+                ON CONFLICT(user_id) DO UPDATE SET
+                    username = excluded.username,
+                    first_name = excluded.first_name,
+                    last_name = excluded.last_name,
+                    language_code = excluded.language_code
+                WHERE users.username IS NOT excluded.username
+                   OR users.first_name IS NOT excluded.first_name
+                   OR users.last_name IS NOT excluded.last_name
+                   OR users.language_code IS NOT excluded.language_code
+            ''', (user_data['user_id'], *profile))
+
+        self.seen_users.set(user_data['user_id'], profile_hash)
+
+    async def load_admins(self):
+        """Загрузка списка администраторов в память"""
+        async with self.pool.read() as db:
+            cursor = await db.execute('SELECT user_id FROM users WHERE is_admin')
+            rows = await cursor.fetchall()
+
+        admin_ids = {row[0] for row in rows}
+        if settings.ADMIN_USER_ID:
+            admin_ids.add(settings.ADMIN_USER_ID)
+        self.admin_ids = admin_ids
+
+    def is_admin_cached(self, user_id: int) -> bool:
+        """Проверка администратора по списку в памяти"""
+        return user_id in self.admin_ids
 
     async def is_admin(self, user_id: int) -> bool:
         """Проверка администратора"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute(
-                'SELECT is_admin FROM users WHERE user_id = ?',
-                (user_id,)
-            )
-            result = await cursor.fetchone()
-            return result and result[0]
+        return self.is_admin_cached(user_id)
+
+    async def set_admin(self, user_id: int, is_admin: bool = True):
+        """Назначение или снятие прав администратора"""
+        async with self.pool.write() as db:
+            await db.execute('''
+                INSERT INTO users (user_id, is_admin) VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET is_admin = excluded.is_admin
+            ''', (user_id, is_admin))
+
+        if is_admin:
+            self.admin_ids.add(user_id)
+        else:
+            self.admin_ids.discard(user_id)
 
     async def create_giveaway(self, giveaway_data: Dict) -> str:
         """Создание розыгрыша"""
         import uuid
         giveaway_id = str(uuid.uuid4())
 
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.write() as db:
             await db.execute('''
                 INSERT INTO giveaways 
                 (id, name, description, admin_id, prizes_count, max_participants,
@@ -146,27 +230,93 @@ class DatabaseManager:
                 giveaway_data.get('button_text', 'Участвовать'),
                 giveaway_data.get('show_participants_count', True)
             ))
-            await db.commit()
 
+        self.giveaway_cache.invalidate(giveaway_id)
         return giveaway_id
 
+    async def iter_giveaways_by_admin(self, admin_id: int,
+                                      chunk_size: int = 100) -> AsyncIterator[tuple]:
+        """Потоковое чтение розыгрышей администратора"""
+        async for row in self.pool.stream('''
+            SELECT * FROM giveaways
+            WHERE admin_id = ?
+            ORDER BY created_at DESC, id DESC
+        ''', (admin_id,), chunk_size):
+            yield row
+
     async def get_giveaways_by_admin(self, admin_id: int) -> List[Dict]:
         """Получение розыгрышей администратора"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                SELECT * FROM giveaways 
-                WHERE admin_id = ? 
-                ORDER BY created_at DESC
-            ''', (admin_id,))
+        return [row._asdict() async for row in self.iter_giveaways_by_admin(admin_id)]
 
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
+    async def get_admin_giveaway_page(self, admin_id: int, direction: str = 'first',
+                                      cursor: Optional[Tuple[str, str]] = None) -> Optional[Dict]:
+        """Один розыгрыш администратора при постраничном просмотре.
+
+        Розыгрыши упорядочены от новых к старым по (created_at, id); cursor -
+        ключ текущего розыгрыша. direction: first, last, next (старше cursor),
+        prev (новее cursor), current (сам cursor или следующий, если его удалили).
+        В той же выборке возвращаются total_count и position (с нуля).
+        """
+        if direction in ('next', 'prev', 'current') and cursor is None:
+            direction = 'first'
+
+        conditions = {
+            'first': ('', 'DESC'),
+            'last': ('', 'ASC'),
+            'next': ('AND (g.created_at, g.id) < (?, ?)', 'DESC'),
+            'prev': ('AND (g.created_at, g.id) > (?, ?)', 'ASC'),
+            'current': ('AND (g.created_at, g.id) <= (?, ?)', 'DESC'),
+        }
+        if direction not in conditions:
+            raise ValueError(f"Неизвестное направление: {direction}")
+
+        condition, order = conditions[direction]
+        params = [admin_id, admin_id, admin_id]
+        if condition:
+            params.extend(cursor)
+
+        async with self.pool.read() as db:
+            db_cursor = await db.execute(f'''
+                SELECT g.*,
+                       (SELECT COUNT(*) FROM giveaways WHERE admin_id = ?) AS total_count,
+                       (SELECT COUNT(*) FROM giveaways n
+                        WHERE n.admin_id = ? AND (n.created_at, n.id) > (g.created_at, g.id)) AS position
+                FROM giveaways g
+                WHERE g.admin_id = ? {condition}
+                ORDER BY g.created_at {order}, g.id {order}
+                LIMIT 1
+            ''', params)
+
+            row = await db_cursor.fetchone()
+            if not row:
+                return None
 
-            return [dict(zip(columns, row)) for row in rows]
+            columns = [description[0] for description in db_cursor.description]
+            return dict(zip(columns, row))
+
+    async def count_giveaways_by_admin(self, admin_id: int) -> int:
+        """Количество розыгрышей администратора"""
+        async with self.pool.read() as db:
+            cursor = await db.execute(
+                'SELECT COUNT(*) FROM giveaways WHERE admin_id = ?',
+                (admin_id,)
+            )
+            result = await cursor.fetchone()
+            return result[0] if result else 0
 
     async def get_giveaway(self, giveaway_id: str) -> Optional[Dict]:
-        """Получение информации о розыгрыше"""
-        async with aiosqlite.connect(self.db_path) as db:
+        """Получение информации о розыгрыше.
+
+        Строка берется из кэша; participants_count в ней может отставать на время
+        жизни записи, точное значение дает get_participants_count.
+        """
+        giveaway = self.giveaway_cache.get(giveaway_id)
+        if giveaway is not None:
+            return dict(giveaway)
+
+        generation = self.giveaway_cache.generation
+
+        async with self.pool.read() as db:
             cursor = await db.execute(
                 'SELECT * FROM giveaways WHERE id = ?',
                 (giveaway_id,)
@@ -175,54 +325,110 @@ class DatabaseManager:
 
             if row:
                 columns = [description[0] for description in cursor.description]
-                return dict(zip(columns, row))
+                giveaway = dict(zip(columns, row))
+                self.giveaway_cache.set(giveaway_id, giveaway, generation=generation)
+                return dict(giveaway)
             return None
 
-    async def add_participant(self, giveaway_id: str, user_data: Dict,
-                              referred_by: Optional[int] = None) -> bool:
-        """Добавление участника"""
-        try:
-            async with aiosqlite.connect(self.db_path) as db:
+    async def join_giveaway(self, giveaway_id: str, user_data: Dict,
+                            referred_by: Optional[int] = None,
+                            confirmation: Optional[Callable[[int], List[Dict]]] = None,
+                            confirmation_batch_id: Optional[str] = None) -> JoinResult:
+        """Участие в розыгрыше одной транзакцией: статус, дубли, лимит и вставка.
+
+        confirmation(номер участника) возвращает сообщения для outbox: они
+        записываются в той же транзакции, только если участник добавлен.
+        Диспетчер рассылки после этого нужно разбудить (Broadcaster.notify).
+        """
+        async with self.pool.write() as db:
+            # Вставка проходит только для активного розыгрыша со свободными местами
+            cursor = await db.execute('''
+                INSERT OR IGNORE INTO participants
+                (giveaway_id, user_id, username, first_name, last_name, referred_by)
+                SELECT id, ?, ?, ?, ?, ?
+                FROM giveaways
+                WHERE id = ? AND status = 'published'
+                  AND (max_participants <= 0 OR participants_count < max_participants)
+            ''', (
+                user_data['user_id'],
+                user_data.get('username'),
+                user_data.get('first_name'),
+                user_data.get('last_name'),
+                referred_by,
+                giveaway_id
+            ))
+            inserted = cursor.rowcount == 1
+
+            if inserted and referred_by:
                 await db.execute('''
-                    INSERT INTO participants 
-                    (giveaway_id, user_id, username, first_name, last_name, referred_by)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    giveaway_id,
-                    user_data['user_id'],
-                    user_data.get('username'),
-                    user_data.get('first_name'),
-                    user_data.get('last_name'),
-                    referred_by
-                ))
-
-                # Обновляем счетчик рефералов
-                if referred_by:
-                    await db.execute('''
-                        UPDATE participants 
-                        SET referral_count = referral_count + 1
-                        WHERE giveaway_id = ? AND user_id = ?
-                    ''', (giveaway_id, referred_by))
-
-                await db.commit()
-                return True
-        except Exception as e:
-            print(f"Ошибка добавления участника: {e}")
-            return False
+                    UPDATE participants
+                    SET referral_count = referral_count + 1
+                    WHERE giveaway_id = ? AND user_id = ?
+                ''', (giveaway_id, referred_by))
+
+            cursor = await db.execute('''
+                SELECT status, max_participants, participants_count,
+                       EXISTS(SELECT 1 FROM participants WHERE giveaway_id = ? AND user_id = ?)
+                FROM giveaways WHERE id = ?
+            ''', (giveaway_id, user_data['user_id'], giveaway_id))
+            row = await cursor.fetchone()
+
+            if inserted and row and confirmation:
+                await insert_messages(db, confirmation(row[2]), confirmation_batch_id)
+
+        if not row:
+            return JoinResult(JoinStatus.NOT_FOUND)
+
+        status, max_participants, participants_count, is_participating = row
+
+        if inserted:
+            return JoinResult(JoinStatus.JOINED, participants_count)
+        if is_participating:
+            return JoinResult(JoinStatus.ALREADY, participants_count)
+        if status != 'published':
+            return JoinResult(JoinStatus.INACTIVE, participants_count)
+        return JoinResult(JoinStatus.FULL, participants_count)
 
     async def get_participants_count(self, giveaway_id: str) -> int:
         """Получение количества участников"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.read() as db:
             cursor = await db.execute(
-                'SELECT COUNT(*) FROM participants WHERE giveaway_id = ?',
+                'SELECT participants_count FROM giveaways WHERE id = ?',
                 (giveaway_id,)
             )
             result = await cursor.fetchone()
             return result[0] if result else 0
 
+    async def repair_participants_count(self, giveaway_id: Optional[str] = None) -> int:
+        """Пересчет счетчика участников, возвращает число исправленных розыгрышей"""
+        conditions = ['g.participants_count != (SELECT COUNT(*) FROM participants p WHERE p.giveaway_id = g.id)']
+        params = []
+
+        if giveaway_id:
+            conditions.append('g.id = ?')
+            params.append(giveaway_id)
+
+        async with self.pool.write() as db:
+            cursor = await db.execute(f'''
+                UPDATE giveaways SET participants_count = (
+                    SELECT COUNT(*) FROM participants p WHERE p.giveaway_id = giveaways.id
+                )
+                WHERE id IN (
+                    SELECT g.id FROM giveaways g
+                    WHERE {' AND '.join(conditions)}
+                )
+            ''', params)
+            return cursor.rowcount
+
+    async def rebuild_statistics(self):
+        """Пересчет сводной статистики администраторов (admin_stats) с нуля"""
+        async with self.pool.write() as db:
+            for statement in REBUILD_STATISTICS:
+                await db.execute(statement)
+
     async def is_participating(self, giveaway_id: str, user_id: int) -> bool:
         """Проверка участия пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self.pool.read() as db:
             cursor = await db.execute(
                 'SELECT 1 FROM participants WHERE giveaway_id = ? AND user_id = ?',
                 (giveaway_id, user_id)
@@ -248,10 +454,11 @@ class DatabaseManager:
 
             sql = f"UPDATE giveaways SET {', '.join(set_clauses)} WHERE id = ?"
 
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self.pool.write() as db:
                 await db.execute(sql, values)
-                await db.commit()
-                return True
+
+            self.giveaway_cache.invalidate(giveaway_id)
+            return True
         except Exception as e:
             print(f"Ошибка обновления розыгрыша: {e}")
             return False
@@ -259,13 +466,14 @@ class DatabaseManager:
     async def delete_giveaway(self, giveaway_id: str) -> bool:
         """Удаление розыгрыша"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self.pool.write() as db:
                 # Удаляем связанные данные
                 await db.execute('DELETE FROM participants WHERE giveaway_id = ?', (giveaway_id,))
                 await db.execute('DELETE FROM winners WHERE giveaway_id = ?', (giveaway_id,))
                 await db.execute('DELETE FROM giveaways WHERE id = ?', (giveaway_id,))
-                await db.commit()
-                return True
+
+            self.giveaway_cache.invalidate(giveaway_id)
+            return True
         except Exception as e:
             print(f"Ошибка удаления розыгрыша: {e}")
             return False
\ No newline at end of file
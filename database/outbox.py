@@ -0,0 +1,173 @@
+import time
+from typing import Dict, List, Optional
+
+
+async def insert_messages(conn, messages: List[Dict], batch_id: Optional[str] = None,
+                          priority: int = 0) -> int:
+    """Запись сообщений в outbox на уже открытом соединении писателя.
+
+    Позволяет поставить сообщения в очередь в той же транзакции, что и
+    изменение, которое они подтверждают (например, участие в розыгрыше).
+    """
+    if not messages:
+        return 0
+
+    now = time.time()
+
+    await conn.executemany('''
+        INSERT INTO outbox
+        (batch_id, chat_id, text, parse_mode, reply_markup, priority, next_attempt_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', [
+        (
+            batch_id,
+            message['chat_id'],
+            message['text'],
+            message.get('parse_mode'),
+            message.get('reply_markup'),
+            priority,
+            now
+        )
+        for message in messages
+    ])
+
+    return len(messages)
+
+
+class Outbox:
+    """Очередь исходящих сообщений в базе данных.
+
+    Сообщения переживают перезапуск бота: при старте незавершенные отправки
+    возвращаются в очередь (reset_in_flight).
+    """
+
+    PENDING = 'pending'
+    SENDING = 'sending'
+    SENT = 'sent'
+    FAILED = 'failed'
+
+    def __init__(self, db_manager):
+        self.db = db_manager
+
+    async def enqueue(self, messages: List[Dict], batch_id: Optional[str] = None,
+                      priority: int = 0) -> int:
+        """Постановка сообщений в очередь, возвращает их количество.
+
+        Каждое сообщение - словарь с ключами chat_id, text и необязательными
+        parse_mode и reply_markup (JSON-строка).
+        """
+        if not messages:
+            return 0
+
+        async with self.db.pool.write() as conn:
+            return await insert_messages(conn, messages, batch_id, priority)
+
+    async def claim_due(self, limit: int) -> List[Dict]:
+        """Выбор сообщений, готовых к отправке, с пометкой 'sending'"""
+        now = time.time()
+
+        async with self.db.pool.write() as conn:
+            cursor = await conn.execute('''
+                SELECT * FROM outbox
+                WHERE status = ? AND next_attempt_at <= ?
+                ORDER BY priority DESC, id ASC
+                LIMIT ?
+            ''', (self.PENDING, now, limit))
+
+            rows = await cursor.fetchall()
+            columns = [description[0] for description in cursor.description]
+            messages = [dict(zip(columns, row)) for row in rows]
+
+            if messages:
+                placeholders = ', '.join('?' for _ in messages)
+                await conn.execute(f'''
+                    UPDATE outbox SET status = ?
+                    WHERE id IN ({placeholders})
+                ''', (self.SENDING, *[message['id'] for message in messages]))
+
+        return messages
+
+    async def next_due_at(self) -> Optional[float]:
+        """Время ближайшей запланированной отправки"""
+        async with self.db.pool.read() as conn:
+            cursor = await conn.execute(
+                'SELECT MIN(next_attempt_at) FROM outbox WHERE status = ?',
+                (self.PENDING,)
+            )
+            result = await cursor.fetchone()
+            return result[0] if result else None
+
+    async def mark_sent(self, message_id: int):
+        """Сообщение доставлено"""
+        async with self.db.pool.write() as conn:
+            await conn.execute('''
+                UPDATE outbox
+                SET status = ?, attempts = attempts + 1, sent_at = CURRENT_TIMESTAMP, last_error = NULL
+                WHERE id = ?
+            ''', (self.SENT, message_id))
+
+    async def mark_failed(self, message_id: int, error: str):
+        """Сообщение не может быть доставлено"""
+        async with self.db.pool.write() as conn:
+            await conn.execute('''
+                UPDATE outbox
+                SET status = ?, attempts = attempts + 1, last_error = ?
+                WHERE id = ?
+            ''', (self.FAILED, error, message_id))
+
+    async def reschedule(self, message_id: int, delay: float, error: str,
+                         count_attempt: bool = True):
+        """Повторная попытка через delay секунд"""
+        async with self.db.pool.write() as conn:
+            await conn.execute('''
+                UPDATE outbox
+                SET status = ?, attempts = attempts + ?, last_error = ?, next_attempt_at = ?
+                WHERE id = ?
+            ''', (self.PENDING, 1 if count_attempt else 0, error, time.time() + delay, message_id))
+
+    async def reset_in_flight(self) -> int:
+        """Возврат в очередь сообщений, отправка которых прервалась остановкой бота"""
+        async with self.db.pool.write() as conn:
+            cursor = await conn.execute(
+                'UPDATE outbox SET status = ? WHERE status = ?',
+                (self.PENDING, self.SENDING)
+            )
+            return cursor.rowcount
+
+    async def purge_finished(self, older_than_days: int, chunk_size: int = 5000) -> int:
+        """Удаление доставленных и недоставленных сообщений старше older_than_days дней.
+
+        Удаляется пачками по chunk_size строк, чтобы не занимать писателя надолго.
+        """
+        purged = 0
+
+        while True:
+            async with self.db.pool.write() as conn:
+                cursor = await conn.execute('''
+                    DELETE FROM outbox WHERE id IN (
+                        SELECT id FROM outbox
+                        WHERE status IN (?, ?)
+                          AND COALESCE(sent_at, created_at) < datetime('now', ?)
+                        LIMIT ?
+                    )
+                ''', (self.SENT, self.FAILED, f'-{older_than_days} days', chunk_size))
+                deleted = cursor.rowcount
+
+            purged += deleted
+            if deleted < chunk_size:
+                return purged
+
+    async def batch_stats(self, batch_id: str) -> Dict[str, int]:
+        """Статистика доставки рассылки по статусам"""
+        async with self.db.pool.read() as conn:
+            cursor = await conn.execute('''
+                SELECT status, COUNT(*) FROM outbox
+                WHERE batch_id = ?
+                GROUP BY status
+            ''', (batch_id,))
+            rows = await cursor.fetchall()
+
+        stats = {self.PENDING: 0, self.SENDING: 0, self.SENT: 0, self.FAILED: 0}
+        stats.update({status: count for status, count in rows})
+        stats['total'] = sum(count for _, count in rows)
+        return stats
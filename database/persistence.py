@@ -0,0 +1,252 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, Optional, Tuple
+from telegram.ext import BasePersistence, PersistenceInput
+from utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+USER = 'user'
+CHAT = 'chat'
+BOT = 'bot'
+CONVERSATION = 'conversation:'
+
+_RowKey = Tuple[str, str]
+
+# Строки нет в кэше: неизвестно, есть ли она в базе
+_UNKNOWN = object()
+
+
+def _encode(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'))
+
+
+class SQLitePersistence(BasePersistence):
+    """Хранение user_data, chat_data, bot_data и состояний диалогов в базе бота.
+
+    Данные каждого пользователя и чата - отдельная строка таблицы persistence
+    в JSON. Строка читается при первом обращении к пользователю (refresh_user_data),
+    а записываются только изменившиеся строки, одной пачкой на каждый проход
+    Application.update_persistence. Поэтому стоимость зависит от числа активных
+    пользователей, а не от общего.
+
+    Значения должны сериализоваться в JSON; кортежи восстанавливаются списками.
+
+    Какие строки уже прочитаны и что в них записано, помнит ограниченный кэш
+    (cache_size строк, не дольше cache_ttl секунд). Вытесненный пользователь
+    при следующем обращении снова читается из базы, поэтому память зависит
+    от числа недавно активных пользователей.
+    """
+
+    def __init__(self, db_manager, update_interval: float = 60,
+                 cache_size: int = 10000, cache_ttl: float = 3600):
+        super().__init__(
+            store_data=PersistenceInput(callback_data=False),
+            update_interval=update_interval
+        )
+        self.db = db_manager
+        # Прочитанные строки: последнее записанное значение (для пропуска
+        # неизмененных данных) или None, если строки в базе нет
+        self._stored = TTLCache(cache_size, cache_ttl)
+        # Изменения, ожидающие записи; None - удаление. Не ограничен: очищается
+        # каждым проходом записи
+        self._dirty: Dict[_RowKey, Optional[str]] = {}
+        self._write_task: Optional[asyncio.Task] = None
+
+    def _is_loaded(self, kind: str, key: str) -> bool:
+        return (kind, key) in self._stored
+
+    async def _load(self, kind: str, key: str) -> Optional[Any]:
+        async with self.db.pool.read() as conn:
+            cursor = await conn.execute(
+                'SELECT data FROM persistence WHERE kind = ? AND key = ?',
+                (kind, key)
+            )
+            row = await cursor.fetchone()
+
+        self._stored.set((kind, key), row[0] if row else None)
+        return json.loads(row[0]) if row else None
+
+    def _stage(self, kind: str, key: str, data: Any):
+        """Постановка строки в очередь записи, если она изменилась"""
+        row_key = (kind, key)
+        current = self._dirty.get(row_key, self._stored.get(row_key, _UNKNOWN))
+
+        # Пустые данные не храним: большинство пользователей ничего не сохраняет
+        if data == {}:
+            if current is not None:
+                self._stage_delete(kind, key)
+            return
+
+        try:
+            encoded = _encode(data)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Данные {kind}:{key} не сериализуются в JSON и не будут сохранены: {e}")
+            return
+
+        if current == encoded:
+            return
+
+        self._dirty[row_key] = encoded
+
+    def _stage_delete(self, kind: str, key: str):
+        self._dirty[(kind, key)] = None
+
+    async def _write_dirty(self):
+        """Запись накопленных изменений.
+
+        Все вызовы update_* одного прохода update_persistence ставят строки в
+        очередь синхронно и ждут одну общую запись.
+        """
+        if not self._dirty:
+            return
+
+        if self._write_task is None:
+            self._write_task = asyncio.ensure_future(self._write_batch())
+
+        await asyncio.shield(self._write_task)
+
+    async def _write_batch(self):
+        # Даем остальным update_* текущего прохода поставить свои строки
+        await asyncio.sleep(0)
+        self._write_task = None
+        batch, self._dirty = self._dirty, {}
+
+        upserts = [(kind, key, data) for (kind, key), data in batch.items() if data is not None]
+        deletes = [(kind, key) for (kind, key), data in batch.items() if data is None]
+
+        try:
+            async with self.db.pool.write() as conn:
+                if upserts:
+                    await conn.executemany('''
+                        INSERT INTO persistence (kind, key, data, updated_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                        ON CONFLICT(kind, key) DO UPDATE SET
+                            data = excluded.data,
+                            updated_at = excluded.updated_at
+                    ''', upserts)
+                if deletes:
+                    await conn.executemany(
+                        'DELETE FROM persistence WHERE kind = ? AND key = ?',
+                        deletes
+                    )
+        except Exception:
+            # Возвращаем в очередь то, что не было перезаписано новыми изменениями
+            for row_key, data in batch.items():
+                self._dirty.setdefault(row_key, data)
+            raise
+
+        for kind, key, data in upserts:
+            self._stored.set((kind, key), data)
+        for row_key in deletes:
+            self._stored.set(row_key, None)
+
+        logger.debug(f"Persistence: записано {len(upserts)}, удалено {len(deletes)}")
+
+    # Пользователи и чаты загружаются лениво
+
+    async def get_user_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def get_chat_data(self) -> Dict[int, Dict[Any, Any]]:
+        return {}
+
+    async def refresh_user_data(self, user_id: int, user_data: Dict[Any, Any]) -> None:
+        # Несохраненные изменения новее строки в базе
+        if self._is_loaded(USER, str(user_id)) or (USER, str(user_id)) in self._dirty:
+            return
+
+        stored = await self._load(USER, str(user_id))
+        if stored:
+            # Значения, уже записанные обработчиком, важнее сохраненных
+            for key, value in stored.items():
+                user_data.setdefault(key, value)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: Dict[Any, Any]) -> None:
+        # Несохраненные изменения новее строки в базе
+        if self._is_loaded(CHAT, str(chat_id)) or (CHAT, str(chat_id)) in self._dirty:
+            return
+
+        stored = await self._load(CHAT, str(chat_id))
+        if stored:
+            for key, value in stored.items():
+                chat_data.setdefault(key, value)
+
+    async def update_user_data(self, user_id: int, data: Dict[Any, Any]) -> None:
+        if not self._is_loaded(USER, str(user_id)) and (USER, str(user_id)) not in self._dirty:
+            # Данные изменены без обращения через обработчик - не затираем сохраненные
+            stored = await self._load(USER, str(user_id)) or {}
+            data = {**stored, **data}
+
+        self._stage(USER, str(user_id), data)
+        await self._write_dirty()
+
+    async def update_chat_data(self, chat_id: int, data: Dict[Any, Any]) -> None:
+        if not self._is_loaded(CHAT, str(chat_id)) and (CHAT, str(chat_id)) not in self._dirty:
+            stored = await self._load(CHAT, str(chat_id)) or {}
+            data = {**stored, **data}
+
+        self._stage(CHAT, str(chat_id), data)
+        await self._write_dirty()
+
+    async def drop_user_data(self, user_id: int) -> None:
+        self._stage_delete(USER, str(user_id))
+        await self._write_dirty()
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        self._stage_delete(CHAT, str(chat_id))
+        await self._write_dirty()
+
+    # Общие данные бота - одна строка, читается при запуске
+
+    async def get_bot_data(self) -> Dict[Any, Any]:
+        return await self._load(BOT, '') or {}
+
+    async def refresh_bot_data(self, bot_data: Dict[Any, Any]) -> None:
+        pass
+
+    async def update_bot_data(self, data: Dict[Any, Any]) -> None:
+        self._stage(BOT, '', data)
+        await self._write_dirty()
+
+    # Состояния ConversationHandler: строка на каждый диалог
+
+    async def get_conversations(self, name: str) -> Dict[Tuple, object]:
+        kind = CONVERSATION + name
+
+        async with self.db.pool.read() as conn:
+            cursor = await conn.execute(
+                'SELECT key, data FROM persistence WHERE kind = ?',
+                (kind,)
+            )
+            rows = await cursor.fetchall()
+
+        conversations = {}
+        for key, data in rows:
+            self._stored.set((kind, key), data)
+            conversations[tuple(json.loads(key))] = json.loads(data)
+        return conversations
+
+    async def update_conversation(self, name: str, key: Tuple,
+                                  new_state: Optional[object]) -> None:
+        kind = CONVERSATION + name
+        row_key = _encode(list(key))
+
+        if new_state is None:
+            if self._dirty.get((kind, row_key), self._stored.get((kind, row_key), _UNKNOWN)) is not None:
+                self._stage_delete(kind, row_key)
+        else:
+            self._stage(kind, row_key, new_state)
+        await self._write_dirty()
+
+    # Произвольные callback_data не используются
+
+    async def get_callback_data(self) -> Optional[Any]:
+        return None
+
+    async def update_callback_data(self, data: Any) -> None:
+        pass
+
+    async def flush(self) -> None:
+        await self._write_dirty()
@@ -0,0 +1,292 @@
+import asyncio
+import logging
+from collections import namedtuple
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional, Sequence
+
+import aiosqlite
+
+logger = logging.getLogger(__name__)
+
+WriteJob = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+class ConnectionPool:
+    """Пул долгоживущих соединений SQLite: один писатель и несколько читателей.
+
+    Все записи проходят через единственную фоновую задачу писателя: задания,
+    накопившиеся в очереди за один такт, выполняются в одной транзакции
+    (каждое под своим SAVEPOINT), поэтому ошибка одного задания не откатывает
+    остальные. В режиме WAL читатели не блокируются писателем.
+    """
+
+    def __init__(self, db_path: str, readers_count: int = 4,
+                 busy_timeout_ms: int = 5000, mmap_size: int = 0,
+                 cache_size: int = -2000, batch_size: int = 500):
+        self.db_path = db_path
+        self.readers_count = max(1, readers_count)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.batch_size = max(1, batch_size)
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._writer_task: Optional[asyncio.Task] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._readers: Optional[asyncio.Queue] = None
+        self._all_readers: List[aiosqlite.Connection] = []
+        self._open_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def _connect(self) -> aiosqlite.Connection:
+        """Открытие одного соединения с настройкой PRAGMA"""
+        # Транзакциями управляем сами, поэтому отключаем неявный BEGIN
+        conn = await aiosqlite.connect(self.db_path, isolation_level=None)
+        await conn.execute(f'PRAGMA busy_timeout = {int(self.busy_timeout_ms)}')
+        await conn.execute('PRAGMA synchronous = NORMAL')
+        await conn.execute(f'PRAGMA cache_size = {int(self.cache_size)}')
+        if self.mmap_size:
+            await conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        return conn
+
+    async def open(self):
+        """Открытие всех соединений пула и запуск писателя"""
+        async with self._open_lock:
+            if self.is_open:
+                return
+
+            writer = await self._connect()
+            cursor = await writer.execute('PRAGMA journal_mode = WAL')
+            journal_mode = (await cursor.fetchone())[0]
+            if str(journal_mode).lower() != 'wal':
+                logger.warning(f"Режим WAL недоступен, используется {journal_mode}")
+
+            readers = asyncio.Queue()
+            all_readers = []
+
+            for _ in range(self.readers_count):
+                conn = await self._connect()
+                all_readers.append(conn)
+                readers.put_nowait(conn)
+
+            self._writer = writer
+            self._readers = readers
+            self._all_readers = all_readers
+            self._queue = asyncio.Queue()
+            self._writer_task = asyncio.create_task(self._writer_loop(writer, self._queue))
+            logger.info(f"Пул соединений открыт: 1 писатель, {self.readers_count} читателей")
+
+    async def close(self):
+        """Завершение писателя и закрытие всех соединений пула"""
+        async with self._open_lock:
+            if not self.is_open:
+                return
+
+            # Писатель обработает оставшиеся задания и завершится
+            self._queue.put_nowait(None)
+            await self._writer_task
+
+            for conn in [self._writer] + self._all_readers:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия соединения: {e}")
+
+            self._writer = None
+            self._writer_task = None
+            self._queue = None
+            self._readers = None
+            self._all_readers = []
+            logger.info("Пул соединений закрыт")
+
+    async def _writer_loop(self, conn: aiosqlite.Connection, queue: asyncio.Queue):
+        """Фоновая задача, выполняющая записи пакетами"""
+        stopping = False
+
+        while not stopping:
+            item = await queue.get()
+            if item is None:
+                break
+
+            # Даем конкурентным задачам поставить свои записи в этот же такт
+            await asyncio.sleep(0)
+
+            batch = [item]
+            while len(batch) < self.batch_size:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            try:
+                await self._run_batch(conn, batch)
+            except Exception as e:
+                # Писатель должен жить: иначе следующие задания ждали бы вечно
+                logger.error(f"Ошибка писателя при выполнении пакета записей: {e}")
+                self._fail_batch(batch, e)
+
+    @staticmethod
+    def _fail_batch(batch: List, error: BaseException):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
+
+    async def _run_batch(self, conn: aiosqlite.Connection, batch: List):
+        """Выполнение пакета заданий в одной транзакции"""
+        results = []
+
+        try:
+            await conn.execute('BEGIN IMMEDIATE')
+        except Exception as e:
+            self._fail_batch(batch, e)
+            return
+
+        try:
+            for job, future in batch:
+                await conn.execute('SAVEPOINT job')
+                try:
+                    result = await job(conn)
+                except BaseException as e:
+                    await conn.execute('ROLLBACK TO SAVEPOINT job')
+                    await conn.execute('RELEASE SAVEPOINT job')
+                    results.append((future, None, e))
+                else:
+                    await conn.execute('RELEASE SAVEPOINT job')
+                    results.append((future, result, None))
+        except Exception as e:
+            # Сбой самой транзакции (например, SQLite уже откатил ее после
+            # ошибки ввода-вывода): весь пакет считается невыполненным
+            logger.error(f"Ошибка выполнения пакета записей: {e}")
+            try:
+                await conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            self._fail_batch(batch, e)
+            return
+
+        try:
+            await conn.execute('COMMIT')
+        except Exception as e:
+            logger.error(f"Ошибка фиксации пакета записей: {e}")
+            try:
+                await conn.execute('ROLLBACK')
+            except Exception:
+                pass
+            results = [(future, None, error or e) for future, _, error in results]
+
+        for future, result, error in results:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    async def submit(self, job: WriteJob) -> Any:
+        """Постановка задания записи в очередь и ожидание его фиксации"""
+        if not self.is_open:
+            await self.open()
+
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((job, future))
+        return await future
+
+    @asynccontextmanager
+    async def read(self):
+        """Соединение для чтения из пула"""
+        if not self.is_open:
+            await self.open()
+
+        readers = self._readers
+        conn = await readers.get()
+        try:
+            yield conn
+        finally:
+            readers.put_nowait(conn)
+
+    async def iter_chunks(self, sql: str, params: Sequence = (),
+                          chunk_size: int = 1000) -> AsyncIterator[List[tuple]]:
+        """Чтение результата запроса пачками по chunk_size строк.
+
+        Соединение читателя занято, пока итерация не завершена, поэтому
+        обрабатывать пачки нужно без долгих ожиданий.
+        """
+        async for _, rows in self._iter_cursor(sql, params, chunk_size):
+            yield rows
+
+    async def stream(self, sql: str, params: Sequence = (),
+                     chunk_size: int = 1000) -> AsyncIterator[tuple]:
+        """Потоковое чтение строк запроса в виде namedtuple с именами колонок"""
+        row_type = None
+
+        async for columns, rows in self._iter_cursor(sql, params, chunk_size):
+            if row_type is None:
+                row_type = namedtuple('Row', columns, rename=True)
+            for row in rows:
+                yield row_type._make(row)
+
+    async def _iter_cursor(self, sql: str, params: Sequence, chunk_size: int):
+        """Пачки строк вместе с именами колонок"""
+        async with self.read() as conn:
+            cursor = await conn.execute(sql, params)
+            try:
+                columns = [description[0] for description in cursor.description]
+                while True:
+                    rows = await cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield columns, rows
+            finally:
+                await cursor.close()
+
+    @asynccontextmanager
+    async def write(self):
+        """Соединение писателя внутри пакетной транзакции.
+
+        Блок выполняется как одно задание очереди: при исключении его изменения
+        откатываются, при успехе выход из блока ждет фиксации транзакции.
+        """
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        done = loop.create_future()
+
+        async def job(conn):
+            ready.set_result(conn)
+            await done
+
+        result = asyncio.ensure_future(self.submit(job))
+        try:
+            await asyncio.wait([ready, result], return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            # Задание остается в очереди: когда до него дойдет очередь, оно
+            # сразу завершится ошибкой и откатит свой SAVEPOINT, а не будет
+            # вечно ждать done и блокировать писателя
+            done.cancel()
+            result.cancel()
+            raise
+        if not ready.done():
+            # Задание не началось: пробрасываем ошибку постановки или BEGIN
+            await result
+
+        try:
+            yield ready.result()
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                done.cancel()
+            else:
+                done.set_exception(e)
+            try:
+                await result
+            except BaseException:
+                pass
+            raise
+        else:
+            done.set_result(None)
+            await result
@@ -1,5 +1,5 @@
-import aiosqlite
-from typing import List, Dict, Optional
+from array import array
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 
 
 class DatabaseQueries:
@@ -8,43 +8,80 @@ class DatabaseQueries:
     def __init__(self, db_manager):
         self.db = db_manager
 
+    async def iter_participants(self, giveaway_id: str,
+                                chunk_size: int = 1000) -> AsyncIterator[tuple]:
+        """Потоковое чтение участников розыгрыша в порядке регистрации"""
+        async for row in self.db.pool.stream('''
+            SELECT * FROM participants
+            WHERE giveaway_id = ?
+            ORDER BY joined_at ASC
+        ''', (giveaway_id,), chunk_size):
+            yield row
+
     async def get_participants(self, giveaway_id: str) -> List[Dict]:
         """Получение всех участников розыгрыша"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
-            cursor = await conn.execute('''
-                SELECT * FROM participants 
-                WHERE giveaway_id = ?
-                ORDER BY joined_at ASC
-            ''', (giveaway_id,))
+        return [row._asdict() async for row in self.iter_participants(giveaway_id)]
+
+    async def get_draw_snapshot(self, giveaway_id: str,
+                                chunk_size: int = 10000) -> Tuple[array, array]:
+        """Компактный снимок участников для розыгрыша: массивы user_id и referral_count"""
+        user_ids = array('q')
+        referral_counts = array('q')
+
+        async for rows in self.db.pool.iter_chunks('''
+            SELECT user_id, COALESCE(referral_count, 0) FROM participants
+            WHERE giveaway_id = ?
+        ''', (giveaway_id,), chunk_size):
+            chunk_user_ids, chunk_referral_counts = zip(*rows)
+            user_ids.extend(chunk_user_ids)
+            referral_counts.extend(chunk_referral_counts)
+
+        return user_ids, referral_counts
+
+    async def get_participants_by_ids(self, giveaway_id: str, user_ids: List[int]) -> List[Dict]:
+        """Получение участников розыгрыша по списку user_id"""
+        if not user_ids:
+            return []
+
+        placeholders = ', '.join('?' for _ in user_ids)
+
+        async with self.db.pool.read() as conn:
+            cursor = await conn.execute(f'''
+                SELECT * FROM participants
+                WHERE giveaway_id = ? AND user_id IN ({placeholders})
+            ''', (giveaway_id, *user_ids))
 
             rows = await cursor.fetchall()
             columns = [description[0] for description in cursor.description]
 
             return [dict(zip(columns, row)) for row in rows]
 
-    async def save_winners(self, giveaway_id: str, winners: List[Dict]):
-        """Сохранение победителей в базу данных"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
-            for winner in winners:
-                await conn.execute('''
+    async def finish_giveaway(self, giveaway_id: str, winners: List[Dict]) -> bool:
+        """Завершение розыгрыша с сохранением победителей одной транзакцией.
+
+        Проходит только для опубликованного розыгрыша; False, если он уже
+        завершен (например, повторным нажатием «Разыграть») - тогда
+        победители не сохраняются.
+        """
+        async with self.db.pool.write() as conn:
+            cursor = await conn.execute('''
+                UPDATE giveaways
+                SET status = 'finished', finished_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'published'
+            ''', (giveaway_id,))
+
+            if cursor.rowcount:
+                await conn.executemany('''
                     INSERT INTO winners (giveaway_id, user_id, place)
                     VALUES (?, ?, ?)
-                ''', (giveaway_id, winner['user_id'], winner['place']))
-            await conn.commit()
-
-    async def update_giveaway_status(self, giveaway_id: str, status: str):
-        """Обновление статуса розыгрыша"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
-            await conn.execute('''
-                UPDATE giveaways 
-                SET status = ?, finished_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (status, giveaway_id))
-            await conn.commit()
+                ''', [(giveaway_id, winner['user_id'], winner['place']) for winner in winners])
+
+        self.db.giveaway_cache.invalidate(giveaway_id)
+        return bool(cursor.rowcount)
 
     async def get_winner_info(self, user_id: int) -> Optional[Dict]:
         """Получение информации о победе пользователя"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
+        async with self.db.pool.read() as conn:
             cursor = await conn.execute('''
                 SELECT w.*, g.name as giveaway_name
                 FROM winners w
@@ -60,66 +97,75 @@ class DatabaseQueries:
                 return dict(zip(columns, row))
             return None
 
+    async def iter_export_participants(self, giveaway_id: str,
+                                       chunk_size: int = 1000) -> AsyncIterator[tuple]:
+        """Потоковое чтение строк экспорта участников розыгрыша"""
+        async for row in self.db.pool.stream('''
+            SELECT
+                user_id as ID,
+                COALESCE(first_name, '') as Name,
+                COALESCE(username, '') as Username,
+                CASE
+                    WHEN username IS NOT NULL THEN 'Active'
+                    ELSE 'No Username'
+                END as Status,
+                joined_at as Date_Register,
+                referral_count as Referrals
+            FROM participants
+            WHERE giveaway_id = ?
+            ORDER BY joined_at ASC
+        ''', (giveaway_id,), chunk_size):
+            yield row
+
     async def export_participants(self, giveaway_id: str, format_type: str = 'csv') -> List[Dict]:
         """Экспорт участников розыгрыша"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
+        return [row._asdict() async for row in self.iter_export_participants(giveaway_id)]
+
+    async def get_hourly_joins(self, giveaway_id: str, since: str,
+                               before: str) -> Tuple[int, List[Tuple[str, int]]]:
+        """Вступления в розыгрыш по часам из giveaway_hourly_joins.
+
+        Часы задаются строками 'YYYY-MM-DD HH:00:00' (UTC). Возвращает число
+        вступлений до since и список [(bucket, joins), ...] для часов
+        из [since, before) по возрастанию; часы без вступлений пропущены.
+        """
+        async with self.db.pool.read() as conn:
             cursor = await conn.execute('''
-                SELECT 
-                    user_id as ID,
-                    COALESCE(first_name, '') as Name,
-                    COALESCE(username, '') as Username,
-                    CASE 
-                        WHEN username IS NOT NULL THEN 'Active'
-                        ELSE 'No Username'
-                    END as Status,
-                    joined_at as Date_Register,
-                    referral_count as Referrals
-                FROM participants 
-                WHERE giveaway_id = ?
-                ORDER BY joined_at ASC
-            ''', (giveaway_id,))
+                SELECT COALESCE(SUM(joins), 0) FROM giveaway_hourly_joins
+                WHERE giveaway_id = ? AND bucket < ?
+            ''', (giveaway_id, since))
+            earlier = (await cursor.fetchone())[0]
 
-            rows = await cursor.fetchall()
-            columns = [description[0] for description in cursor.description]
+            cursor = await conn.execute('''
+                SELECT bucket, joins FROM giveaway_hourly_joins
+                WHERE giveaway_id = ? AND bucket >= ? AND bucket < ?
+                ORDER BY bucket
+            ''', (giveaway_id, since, before))
+            buckets = [(bucket, joins) for bucket, joins in await cursor.fetchall()]
 
-            return [dict(zip(columns, row)) for row in rows]
+        return earlier, buckets
 
     async def get_statistics(self, admin_id: int) -> Dict:
-        """Получение статистики для администратора"""
-        async with aiosqlite.connect(self.db.db_path) as conn:
-            # Общее количество розыгрышей
-            cursor = await conn.execute('''
-                SELECT COUNT(*) FROM giveaways WHERE admin_id = ?
-            ''', (admin_id,))
-            total_giveaways = (await cursor.fetchone())[0]
+        """Получение статистики для администратора.
 
-            # Завершенные розыгрыши
+        Читается одна строка admin_stats, которую поддерживают триггеры
+        (миграция 6), без пересчета по участникам.
+        """
+        async with self.db.pool.read() as conn:
             cursor = await conn.execute('''
-                SELECT COUNT(*) FROM giveaways 
-                WHERE admin_id = ? AND status = 'finished'
+                SELECT total_giveaways, finished_giveaways, distinct_participants,
+                       total_participations, giveaways_with_participants
+                FROM admin_stats WHERE admin_id = ?
             ''', (admin_id,))
-            finished_giveaways = (await cursor.fetchone())[0]
+            row = await cursor.fetchone()
 
-            # Общее количество участников
-            cursor = await conn.execute('''
-                SELECT COUNT(DISTINCT p.user_id) 
-                FROM participants p
-                JOIN giveaways g ON p.giveaway_id = g.id
-                WHERE g.admin_id = ?
-            ''', (admin_id,))
-            total_participants = (await cursor.fetchone())[0]
+            (total_giveaways, finished_giveaways, total_participants,
+             total_participations, giveaways_with_participants) = row or (0, 0, 0, 0, 0)
 
-            # Среднее количество участников на розыгрыш
-            cursor = await conn.execute('''
-                SELECT AVG(participant_count) FROM (
-                    SELECT COUNT(*) as participant_count
-                    FROM participants p
-                    JOIN giveaways g ON p.giveaway_id = g.id
-                    WHERE g.admin_id = ?
-                    GROUP BY g.id
-                )
-            ''', (admin_id,))
-            avg_participants = (await cursor.fetchone())[0] or 0
+            # Среднее по розыгрышам, в которых есть участники
+            avg_participants = (
+                total_participations / giveaways_with_participants if giveaways_with_participants else 0
+            )
 
             return {
                 'total_giveaways': total_giveaways,
@@ -1,22 +1,47 @@
 from datetime import datetime
+from typing import Optional
 import logging
-import aiosqlite
 from telegram import Update
 from telegram.ext import ContextTypes, ConversationHandler
 from database.models import DatabaseManager
+from database.queries import DatabaseQueries
 from keyboards.inline import InlineKeyboards
 from keyboards.reply import ReplyKeyboards
 from config.settings import settings
+from utils.router import CallbackRouter, giveaway_id_arg
+from utils.runtime import BotRuntime
 
 logger = logging.getLogger(__name__)
 
 # Состояния для создания розыгрыша
 GIVEAWAY_NAME, GIVEAWAY_DESCRIPTION, GIVEAWAY_SETTINGS = range(3)
 
+NAVIGATION_DIRECTIONS = ('first', 'prev', 'next', 'last')
+
+
+def navigation_arg(value: str) -> str:
+    """Аргумент маршрута giveaway_nav_ - направление перехода"""
+    if value not in NAVIGATION_DIRECTIONS:
+        raise ValueError(f"Некорректное направление: {value!r}")
+    return value
+
 
 class AdminHandlers:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, runtime: BotRuntime):
         self.db = db_manager
+        self.queries = DatabaseQueries(db_manager)
+        self.runtime = runtime
+
+    def register_routes(self, router: CallbackRouter):
+        """Регистрация callback-маршрутов администратора"""
+        router.add_exact('admin_menu', self.admin_start, admin_only=True)
+        router.add_exact('my_giveaways', self.my_giveaways, admin_only=True)
+        router.add_exact('statistics', self.show_statistics, admin_only=True)
+        router.add_prefix('giveaway_nav_', self.navigate_giveaways, admin_only=True, parser=navigation_arg)
+        router.add_exact('giveaway_refresh', self.navigate_giveaways, admin_only=True, direction='current')
+        router.add_prefix('manage_', self.manage_giveaway, admin_only=True, parser=giveaway_id_arg)
+        router.add_prefix('publish_', self.publish_giveaway, admin_only=True, parser=giveaway_id_arg)
+        router.add_prefix('publish_instant_', self.instant_publish, admin_only=True, parser=giveaway_id_arg)
 
     async def admin_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Стартовое меню для администратора"""
@@ -50,9 +75,10 @@ class AdminHandlers:
     async def my_giveaways(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать список розыгрышей администратора"""
         try:
-            giveaways = await self.db.get_giveaways_by_admin(update.effective_user.id)
+            giveaway = await self.db.get_admin_giveaway_page(update.effective_user.id, 'first')
 
-            if not giveaways:
+            if not giveaway:
+                context.user_data.pop('giveaways_cursor', None)
                 keyboard = InlineKeyboards.admin_main_menu()
                 await update.callback_query.edit_message_text(
                     "📋 **Мои розыгрыши**\n\n"
@@ -64,29 +90,45 @@ class AdminHandlers:
                 return
 
             # Показываем первый розыгрыш
-            context.user_data['giveaways_list'] = giveaways
-            context.user_data['current_giveaway_index'] = 0
-
-            await self.show_giveaway_details(update, context, 0)
+            await self.show_giveaway_details(update, context, giveaway)
         except Exception as e:
             logger.error(f"Ошибка в my_giveaways: {e}")
             await update.callback_query.edit_message_text(
                 "❌ Произошла ошибка при загрузке розыгрышей."
             )
 
-    async def show_giveaway_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE, index: int):
-        """Показать детали розыгрыша"""
+    async def show_statistics(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Статистика администратора из сводки admin_stats"""
         try:
-            giveaways = context.user_data.get('giveaways_list', [])
+            stats = await self.queries.get_statistics(update.effective_user.id)
+            cache = self.db.giveaway_cache.stats()
 
-            if not giveaways or index >= len(giveaways):
-                return
+            await update.callback_query.edit_message_text(
+                f"{settings.EMOJIS['stats']} **Статистика**\n\n"
+                f"**Всего розыгрышей:** {stats['total_giveaways']}\n"
+                f"**Активных:** {stats['active_giveaways']}\n"
+                f"**Завершенных:** {stats['finished_giveaways']}\n"
+                f"**Уникальных участников:** {stats['total_participants']}\n"
+                f"**В среднем участников на розыгрыш:** {stats['avg_participants']}\n\n"
+                f"Кэш розыгрышей: {cache['size']}/{cache['maxsize']}, "
+                f"попаданий {cache['hit_rate']:.0%} ({cache['hits']} из {cache['hits'] + cache['misses']})",
+                reply_markup=InlineKeyboards.statistics_menu(),
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"Ошибка в show_statistics: {e}")
+            await update.callback_query.edit_message_text(
+                "❌ Произошла ошибка при загрузке статистики."
+            )
 
-            giveaway = giveaways[index]
-            participants_count = await self.db.get_participants_count(giveaway['id'])
+    async def show_giveaway_details(self, update: Update, context: ContextTypes.DEFAULT_TYPE, giveaway: dict):
+        """Показать детали розыгрыша (страница из get_admin_giveaway_page)"""
+        try:
+            # Между нажатиями храним только ключ текущего розыгрыша
+            context.user_data['giveaways_cursor'] = (giveaway['created_at'], giveaway['id'])
 
             # Формируем информацию о розыгрыше
-            info_text = await self.format_giveaway_info_local(giveaway, participants_count)
+            info_text = await self.format_giveaway_info_local(giveaway, giveaway['participants_count'])
 
             # Клавиатура управления
             management_keyboard = InlineKeyboards.giveaway_management(
@@ -95,10 +137,10 @@ class AdminHandlers:
             )
 
             # Навигация
-            if len(giveaways) > 1:
+            if giveaway['total_count'] > 1:
                 nav_keyboard = InlineKeyboards.giveaway_navigation(
-                    index,
-                    len(giveaways),
+                    giveaway['position'],
+                    giveaway['total_count'],
                     "giveaway"
                 )
                 # Объединяем клавиатуры
@@ -162,22 +204,30 @@ class AdminHandlers:
 
         return text
 
-    async def navigate_giveaways(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    async def navigate_giveaways(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                 direction: Optional[str] = None):
         """Навигация по розыгрышам"""
         try:
-            callback_data = update.callback_query.data
-            new_index = int(callback_data.split('_')[-1])
+            direction = direction or context.args[0]
+            cursor = context.user_data.get('giveaways_cursor')
+
+            giveaway = await self.db.get_admin_giveaway_page(update.effective_user.id, direction, cursor)
+            if not giveaway and direction != 'first':
+                # Текущий розыгрыш удален или список изменился - начинаем сначала
+                giveaway = await self.db.get_admin_giveaway_page(update.effective_user.id, 'first')
+
+            if not giveaway:
+                await self.my_giveaways(update, context)
+                return
 
-            context.user_data['current_giveaway_index'] = new_index
-            await self.show_giveaway_details(update, context, new_index)
+            await self.show_giveaway_details(update, context, giveaway)
         except Exception as e:
             logger.error(f"Ошибка в navigate_giveaways: {e}")
 
     async def manage_giveaway(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Управление конкретным розыгрышем"""
         try:
-            callback_data = update.callback_query.data
-            giveaway_id = callback_data.split('_')[1]
+            giveaway_id = context.args[0]
 
             giveaway = await self.db.get_giveaway(giveaway_id)
             if not giveaway:
@@ -200,8 +250,7 @@ class AdminHandlers:
     async def publish_giveaway(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Меню публикации розыгрыша"""
         try:
-            callback_data = update.callback_query.data
-            giveaway_id = callback_data.split('_')[1]
+            giveaway_id = context.args[0]
 
             keyboard = InlineKeyboards.publish_options(giveaway_id)
 
@@ -217,8 +266,7 @@ class AdminHandlers:
     async def instant_publish(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Мгновенная публикация"""
         try:
-            callback_data = update.callback_query.data
-            giveaway_id = callback_data.split('_')[2]
+            giveaway_id = context.args[0]
 
             # Обновляем статус в базе данных
             await self.db.update_giveaway(giveaway_id, {
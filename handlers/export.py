@@ -0,0 +1,144 @@
+import asyncio
+import csv
+import gzip
+import io
+import logging
+import tempfile
+from typing import List, Optional, Tuple
+from telegram import Update, InputFile
+from telegram.ext import ContextTypes
+from database.models import DatabaseManager
+from database.queries import DatabaseQueries
+from keyboards.inline import InlineKeyboards
+from config.settings import settings
+from utils.router import CallbackRouter, giveaway_id_arg
+
+logger = logging.getLogger(__name__)
+
+
+class ExportHandlers:
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self.queries = DatabaseQueries(db_manager)
+
+    def register_routes(self, router: CallbackRouter):
+        """Регистрация callback-маршрутов экспорта"""
+        router.add_prefix('export_', self.export_menu, admin_only=True, parser=giveaway_id_arg)
+        router.add_prefix('export_csv_', self.export_participants, admin_only=True,
+                          parser=giveaway_id_arg, compress=False)
+        router.add_prefix('export_gzip_', self.export_participants, admin_only=True,
+                          parser=giveaway_id_arg, compress=True)
+
+    async def export_menu(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Выбор формата экспорта участников"""
+        try:
+            giveaway_id = context.args[0]
+
+            await update.callback_query.edit_message_text(
+                "📤 **Экспорт участников**\n\n"
+                "Выберите формат файла.\n"
+                "Для больших розыгрышей используйте сжатый CSV.",
+                reply_markup=InlineKeyboards.export_options(giveaway_id),
+                parse_mode='Markdown'
+            )
+        except Exception as e:
+            logger.error(f"Ошибка в export_menu: {e}")
+
+    async def export_participants(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
+                                  compress: bool = False):
+        """Экспорт участников в CSV или CSV.GZ и отправка файла"""
+        try:
+            giveaway_id = context.args[0]
+
+            giveaway = await self.db.get_giveaway(giveaway_id)
+            if not giveaway:
+                await update.callback_query.edit_message_text("❌ Розыгрыш не найден!")
+                return
+
+            await update.callback_query.edit_message_text("⏳ Формируем файл экспорта...")
+
+            spool, rows_count = await self.write_participants_csv(giveaway_id, compress)
+            try:
+                if not rows_count:
+                    await update.callback_query.edit_message_text(
+                        "❌ В розыгрыше пока нет участников."
+                    )
+                    return
+
+                size = spool.seek(0, io.SEEK_END)
+                if size > settings.EXPORT_MAX_DOCUMENT_SIZE:
+                    await update.callback_query.edit_message_text(
+                        "❌ Файл экспорта слишком большой для отправки в Telegram.\n"
+                        "Попробуйте сжатый CSV."
+                    )
+                    return
+
+                spool.seek(0)
+                filename = f"participants_{giveaway_id[:8]}.csv" + ('.gz' if compress else '')
+                # python-telegram-bot все равно загружает файл в память целиком перед отправкой
+                content = await asyncio.to_thread(spool.read)
+
+                await context.bot.send_document(
+                    update.effective_chat.id,
+                    document=InputFile(content, filename=filename),
+                    caption=f"📤 Участники розыгрыша «{giveaway['name']}»: {rows_count}"
+                )
+            finally:
+                spool.close()
+
+            await update.callback_query.edit_message_text(
+                f"✅ Экспорт готов: {rows_count} участников.",
+                reply_markup=InlineKeyboards.export_options(giveaway_id)
+            )
+        except Exception as e:
+            logger.error(f"Ошибка в export_participants: {e}")
+            try:
+                await update.callback_query.edit_message_text("❌ Ошибка при экспорте участников.")
+            except:
+                pass
+
+    async def write_participants_csv(self, giveaway_id: str,
+                                     compress: bool = False) -> Tuple[tempfile.SpooledTemporaryFile, int]:
+        """Потоковая запись участников в CSV во временный файл.
+
+        Строки читаются из базы пачками и записываются в отдельном потоке, так что
+        в памяти одновременно находится не больше одной пачки, а крупный файл
+        сбрасывается на диск. Возвращает файл (позиция не определена) и число строк.
+        """
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_SIZE)
+        binary = gzip.GzipFile(filename='participants.csv', fileobj=spool, mode='wb') if compress else spool
+        # utf-8-sig, чтобы Excel корректно открывал кириллицу
+        text = io.TextIOWrapper(binary, encoding='utf-8-sig', newline='')
+        writer = csv.writer(text)
+
+        rows_count = 0
+        chunk: List[tuple] = []
+        header: Optional[tuple] = None
+
+        try:
+            async for row in self.queries.iter_export_participants(
+                    giveaway_id, settings.EXPORT_CHUNK_SIZE):
+                if header is None:
+                    header = row._fields
+                    chunk.append(header)
+
+                chunk.append(row)
+                rows_count += 1
+
+                if len(chunk) >= settings.EXPORT_CHUNK_SIZE:
+                    await asyncio.to_thread(writer.writerows, chunk)
+                    chunk = []
+
+            if chunk:
+                await asyncio.to_thread(writer.writerows, chunk)
+
+            await asyncio.to_thread(text.flush)
+            # Отсоединяем обертку, чтобы ее закрытие не закрыло временный файл
+            text.detach()
+            if compress:
+                await asyncio.to_thread(binary.close)
+        except BaseException:
+            spool.close()
+            raise
+
+        return spool, rows_count
@@ -1,20 +1,34 @@
 from typing import List, Dict
 from database.queries import DatabaseQueries
 import logging
-import random
+import secrets
 from datetime import datetime
 from telegram import Update
 from telegram.ext import ContextTypes
 from database.models import DatabaseManager
 from config.settings import settings
+from utils.draw_executor import DrawExecutor
+from utils.router import CallbackRouter, giveaway_id_arg
+from utils.runtime import BotRuntime
+from utils.sampling import sample_snapshot
 
 logger = logging.getLogger(__name__)
 
 
 class GiveawayHandlers:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, runtime: BotRuntime):
         self.db = db_manager
+        self.runtime = runtime
         self.queries = DatabaseQueries(db_manager)
+        self.draw_executor = DrawExecutor(settings.DRAW_PROCESS_WORKERS)
+
+    def register_routes(self, router: CallbackRouter):
+        """Регистрация callback-маршрутов розыгрыша"""
+        router.add_prefix('draw_', self.draw_winners, admin_only=True, parser=giveaway_id_arg)
+
+    def shutdown(self):
+        """Остановка фоновых ресурсов"""
+        self.draw_executor.shutdown()
 
     def format_winners_list_local(self, winners: List[Dict]) -> str:
         """Локальное форматирование списка победителей"""
@@ -36,20 +50,24 @@ class GiveawayHandlers:
 
     async def draw_winners(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Проведение розыгрыша и выбор победителей"""
-        await update.callback_query.answer()
-
-        callback_data = update.callback_query.data
-        giveaway_id = callback_data.split('_')[1]
+        giveaway_id = context.args[0]
 
         giveaway = await self.db.get_giveaway(giveaway_id)
         if not giveaway:
             await update.callback_query.edit_message_text("❌ Розыгрыш не найден!")
             return
 
-        # Получаем всех участников
-        participants = await self.queries.get_participants(giveaway_id)
+        # Повторное нажатие «Разыграть» выполняется после первого и видит,
+        # что розыгрыш уже завершен
+        if giveaway['status'] != 'published':
+            await update.callback_query.edit_message_text(self._not_drawable_text(giveaway))
+            return
+
+        # Строка розыгрыша может быть из кэша, поэтому счетчик читаем отдельно
+        participants_count = await self.db.get_participants_count(giveaway_id)
+        giveaway['participants_count'] = participants_count
 
-        if not participants:
+        if not participants_count:
             await update.callback_query.edit_message_text(
                 "❌ Нет участников для проведения розыгрыша!"
             )
@@ -57,57 +75,21 @@ class GiveawayHandlers:
 
         prizes_count = giveaway.get('prizes_count', 1)
 
-        if len(participants) < prizes_count:
+        if participants_count < prizes_count:
             await update.callback_query.edit_message_text(
                 f"❌ Недостаточно участников! Нужно минимум {prizes_count} участников."
             )
             return
 
-        # Создаем взвешенный список участников (с учетом рефералов)
-        weighted_participants = []
-        for participant in participants:
-            weight = 1.0
-
-            if giveaway.get('referral_enabled') and participant.get('referral_count', 0) > 0:
-                multiplier = giveaway.get('referral_multiplier', 1.5)
-                max_multiplier = giveaway.get('max_referral_multiplier', 5.0)
-
-                weight = min(
-                    1.0 + (participant['referral_count'] * (multiplier - 1.0)),
-                    max_multiplier
-                )
-
-            # Добавляем участника в список с учетом веса
-            for _ in range(int(weight * 100)):  # Умножаем на 100 для точности
-                weighted_participants.append(participant)
-
-        # Выбираем победителей
-        winners = []
-        used_participants = set()
-
-        for place in range(prizes_count):
-            available_participants = [
-                p for p in weighted_participants
-                if p['user_id'] not in used_participants
-            ]
-
-            if not available_participants:
-                break
-
-            winner = random.choice(available_participants)
-            winners.append({
-                'user_id': winner['user_id'],
-                'username': winner.get('username'),
-                'first_name': winner.get('first_name'),
-                'place': place + 1
-            })
-            used_participants.add(winner['user_id'])
+        winners = await self._select_winners(update, giveaway, prizes_count)
 
-        # Сохраняем победителей в базу данных
-        await self.queries.save_winners(giveaway_id, winners)
-
-        # Обновляем статус розыгрыша
-        await self.queries.update_giveaway_status(giveaway_id, 'finished')
+        # Статус проверяется еще раз при сохранении: победители записываются,
+        # только если розыгрыш все еще опубликован
+        if not await self.queries.finish_giveaway(giveaway_id, winners):
+            logger.info(f"Розыгрыш {giveaway_id} уже завершен, повторные результаты не сохранены")
+            giveaway = await self.db.get_giveaway(giveaway_id) or giveaway
+            await update.callback_query.edit_message_text(self._not_drawable_text(giveaway))
+            return
 
         # Формируем сообщение о победителях
         winners_text = self.format_winners_list_local(winners)
@@ -124,26 +106,93 @@ class GiveawayHandlers:
         # Уведомляем победителей
         await self.notify_winners(giveaway_id, winners, context.bot)
 
+    @staticmethod
+    def _not_drawable_text(giveaway: Dict) -> str:
+        if giveaway['status'] == 'finished':
+            return "⚠️ Розыгрыш уже проведен!"
+        return "❌ Розыгрыш еще не опубликован!"
+
+    async def _report_draw_progress(self, update: Update, text: str):
+        """Отображение хода розыгрыша в сообщении администратора"""
+        try:
+            await update.callback_query.edit_message_text(text)
+        except Exception as e:
+            logger.warning(f"Не удалось обновить ход розыгрыша: {e}")
+
+    async def _select_winners(self, update: Update, giveaway: Dict, prizes_count: int) -> List[Dict]:
+        """Выбор победителей с учетом рефералов: вес участника влияет на шанс"""
+        participants_count = giveaway.get('participants_count', 0)
+        # Большие розыгрыши выполняются в отдельном процессе с отображением хода
+        offload = participants_count >= settings.DRAW_PROCESS_THRESHOLD
+
+        if offload:
+            await self._report_draw_progress(
+                update, f"⏳ Загружаем участников ({participants_count})..."
+            )
+
+        user_ids, referral_counts = await self.queries.get_draw_snapshot(giveaway['id'])
+
+        # Зерно сохраняем в лог, чтобы результат можно было воспроизвести
+        seed = secrets.randbits(64)
+        logger.info(f"Розыгрыш {giveaway['id']}: {len(user_ids)} участников, seed={seed}")
+
+        draw_args = (
+            user_ids,
+            referral_counts,
+            prizes_count,
+            bool(giveaway.get('referral_enabled')),
+            giveaway.get('referral_multiplier', 1.5),
+            giveaway.get('max_referral_multiplier', 5.0),
+            seed
+        )
+
+        if offload:
+            await self._report_draw_progress(
+                update, f"🎲 Выбираем победителей среди {len(user_ids)} участников..."
+            )
+            winner_ids = await self.draw_executor.run(sample_snapshot, *draw_args)
+            await self._report_draw_progress(update, "💾 Сохраняем результаты...")
+        else:
+            winner_ids = sample_snapshot(*draw_args)
+
+        # Полные данные загружаем только для победителей
+        participants = await self.queries.get_participants_by_ids(giveaway['id'], winner_ids)
+        by_user_id = {participant['user_id']: participant for participant in participants}
+
+        return [
+            {
+                'user_id': user_id,
+                'username': by_user_id.get(user_id, {}).get('username'),
+                'first_name': by_user_id.get(user_id, {}).get('first_name'),
+                'place': place
+            }
+            for place, user_id in enumerate(winner_ids, 1)
+        ]
+
     async def notify_winners(self, giveaway_id: str, winners: List[Dict], bot):
-        """Уведомление победителей"""
+        """Уведомление победителей через очередь рассылки"""
         giveaway = await self.db.get_giveaway(giveaway_id)
 
-        for winner in winners:
-            try:
-                message = (
+        messages = [
+            {
+                'chat_id': winner['user_id'],
+                'text': (
                     f"🎉 **Поздравляем! Вы выиграли в розыгрыше!**\n\n"
                     f"**Розыгрыш:** {giveaway['name']}\n"
                     f"**Ваше место:** {winner['place']}\n\n"
                     f"Для получения приза запустите бота командой /start и следуйте инструкциям."
-                )
-
-                await bot.send_message(
-                    winner['user_id'],
-                    message,
-                    parse_mode='Markdown'
-                )
-            except Exception as e:
-                logger.error(f"Error notifying winner {winner['user_id']}: {e}")
+                ),
+                'parse_mode': 'Markdown'
+            }
+            for winner in winners
+        ]
+
+        try:
+            # Уведомления победителей отправляются раньше остальных сообщений очереди
+            count = await self.runtime.broadcaster.send(messages, batch_id=f"winners_{giveaway_id}", priority=10)
+            logger.info(f"Розыгрыш {giveaway_id}: в очередь поставлено {count} уведомлений победителям")
+        except Exception as e:
+            logger.error(f"Error queueing winner notifications for {giveaway_id}: {e}")
 
     async def collect_winner_data(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Сбор данных от победителя"""
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Tuple
+from telegram import Update, InputFile
+from telegram.ext import ContextTypes
+from database.models import DatabaseManager
+from database.queries import DatabaseQueries
+from config.settings import settings
+from utils.cache import TTLCache
+from utils.charts import render_growth_chart
+from utils.router import CallbackRouter, giveaway_id_arg
+
+logger = logging.getLogger(__name__)
+
+BUCKET_FORMAT = '%Y-%m-%d %H:00:00'
+
+
+class GrowthHandlers:
+    """График роста участников розыгрыша.
+
+    Данные берутся из почасовой сводки giveaway_hourly_joins, а не из таблицы
+    участников. В график попадают только закрытые часы, поэтому он не меняется
+    до начала следующего часа: file_id отправленной картинки кэшируется до этого
+    момента, и повторные нажатия не рисуют и не загружают ее заново.
+    """
+
+    def __init__(self, db_manager: DatabaseManager):
+        self.db = db_manager
+        self.queries = DatabaseQueries(db_manager)
+        self.chart_cache = TTLCache(settings.GROWTH_CHART_CACHE_SIZE, 3600)
+
+    def register_routes(self, router: CallbackRouter):
+        """Регистрация callback-маршрутов графика"""
+        router.add_prefix('growth_', self.show_growth_chart, admin_only=True, parser=giveaway_id_arg)
+
+    async def show_growth_chart(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Отправка графика роста участников"""
+        try:
+            giveaway_id = context.args[0]
+
+            giveaway = await self.db.get_giveaway(giveaway_id)
+            if not giveaway:
+                await update.callback_query.edit_message_text("❌ Розыгрыш не найден!")
+                return
+
+            # Строка розыгрыша может быть из кэша, поэтому счетчик читаем отдельно
+            participants_count = await self.db.get_participants_count(giveaway_id)
+
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            current_hour = now.replace(minute=0, second=0, microsecond=0)
+            caption = (
+                f"📈 Рост участников «{giveaway['name']}»\n"
+                f"Сейчас участников: {participants_count}\n"
+                f"Время на графике - UTC, текущий час появится после его окончания."
+            )
+
+            cache_key = (giveaway_id, current_hour)
+            file_id = self.chart_cache.get(cache_key)
+            if file_id:
+                await context.bot.send_photo(update.effective_chat.id, photo=file_id, caption=caption)
+                return
+
+            start_hour = max(
+                current_hour - timedelta(hours=settings.GROWTH_CHART_HOURS),
+                self._created_hour(giveaway)
+            )
+            if start_hour >= current_hour:
+                await context.bot.send_message(
+                    update.effective_chat.id,
+                    "⏳ График появится после первого полного часа розыгрыша."
+                )
+                return
+
+            earlier, buckets = await self.queries.get_hourly_joins(
+                giveaway_id, start_hour.strftime(BUCKET_FORMAT), current_hour.strftime(BUCKET_FORMAT)
+            )
+            hours = self._fill_hours(start_hour, current_hour, buckets)
+
+            # Отрисовка занимает десятки миллисекунд - не блокируем цикл событий
+            image = await asyncio.to_thread(render_growth_chart, hours, earlier)
+
+            message = await context.bot.send_photo(
+                update.effective_chat.id,
+                photo=InputFile(image, filename=f"growth_{giveaway_id[:8]}.png"),
+                caption=caption
+            )
+
+            # Картинка не изменится до закрытия текущего часа
+            ttl = (current_hour + timedelta(hours=1) - now).total_seconds()
+            self.chart_cache.set(cache_key, message.photo[-1].file_id, ttl=ttl)
+        except Exception as e:
+            logger.error(f"Ошибка в show_growth_chart: {e}")
+            try:
+                await update.callback_query.edit_message_text("❌ Ошибка при построении графика.")
+            except:
+                pass
+
+    @staticmethod
+    def _created_hour(giveaway: dict) -> datetime:
+        """Час создания розыгрыша; график не начинается раньше него"""
+        try:
+            created_at = datetime.fromisoformat(str(giveaway['created_at']))
+        except (KeyError, TypeError, ValueError):
+            return datetime.min
+        return created_at.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+
+    @staticmethod
+    def _fill_hours(start_hour: datetime, end_hour: datetime,
+                    buckets: List[Tuple[str, int]]) -> List[Tuple[datetime, int]]:
+        """Непрерывный ряд часов [start_hour, end_hour); часы без вступлений - нули"""
+        joins_by_hour = {bucket: joins for bucket, joins in buckets}
+        hours = []
+
+        hour = start_hour
+        while hour < end_hour:
+            hours.append((hour, joins_by_hour.get(hour.strftime(BUCKET_FORMAT), 0)))
+            hour += timedelta(hours=1)
+
+        return hours
@@ -1,23 +1,32 @@
+import asyncio
 import json
-from typing import List, Dict
+from typing import List, Dict, Optional
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from database.models import DatabaseManager
+from database.models import DatabaseManager, JoinStatus
 from keyboards.inline import InlineKeyboards
 from keyboards.reply import ReplyKeyboards
 from config.settings import settings
+from utils.cache import TTLCache
+from utils.router import CallbackRouter, giveaway_id_arg
+from utils.runtime import BotRuntime
 
 logger = logging.getLogger(__name__)
 
-def generate_referral_link(bot_username: str, giveaway_id: str, user_id: int) -> str:
-    """Генерация реферальной ссылки (локальная версия)"""
-    return f"https://t.me/{bot_username}?start=ref_{giveaway_id}_{user_id}"
-
-
 class UserHandlers:
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, runtime: BotRuntime):
         self.db = db_manager
+        self.runtime = runtime
+        self.subscription_semaphore = asyncio.Semaphore(settings.SUBSCRIPTION_CHECK_CONCURRENCY)
+        # Кэшируются только подтвержденные подписки
+        self.subscription_cache = TTLCache(settings.SUBSCRIPTION_CACHE_SIZE, settings.SUBSCRIPTION_CACHE_TTL)
+
+    def register_routes(self, router: CallbackRouter):
+        """Регистрация callback-маршрутов пользователя"""
+        # Результат участия показывается всплывающим уведомлением, поэтому
+        # на callback отвечает сам обработчик
+        router.add_prefix('participate_', self.participate_in_giveaway, parser=giveaway_id_arg, answer=False)
 
     async def user_start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Стартовое меню для обычного пользователя"""
@@ -46,40 +55,42 @@ class UserHandlers:
                 "❌ Произошла ошибка при инициализации. Попробуйте позже."
             )
 
+    @staticmethod
+    async def _answer(update: Update, text: Optional[str] = None, alert: bool = False):
+        """Ответ на нажатие кнопки участия всплывающим уведомлением.
+
+        Кнопка обычно находится под постом в канале, поэтому результат не
+        записывается в сообщение: уведомление видит только нажавший, и оно
+        приходит, даже если пользователь не открывал личный чат с ботом.
+        """
+        try:
+            # Telegram ограничивает текст уведомления 200 символами
+            await update.callback_query.answer(text[:200] if text else None, show_alert=alert)
+        except Exception as e:
+            logger.warning(f"Не удалось ответить на нажатие кнопки участия: {e}")
+
     async def participate_in_giveaway(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Участие в розыгрыше"""
         try:
-            callback_data = update.callback_query.data
-            giveaway_id = callback_data.split('_')[1]
+            giveaway_id = context.args[0]
             user = update.effective_user
 
             # Проверяем, существует ли розыгрыш
             giveaway = await self.db.get_giveaway(giveaway_id)
             if not giveaway:
-                await update.callback_query.edit_message_text("❌ Розыгрыш не найден!")
+                await self._answer(update, "❌ Розыгрыш не найден!", alert=True)
                 return
 
             # Проверяем статус розыгрыша
             if giveaway['status'] != 'published':
-                await update.callback_query.edit_message_text("❌ Розыгрыш не активен!")
-                return
-
-            # Проверяем, не участвует ли уже пользователь
-            is_participating = await self.db.is_participating(giveaway_id, user.id)
-            if is_participating:
-                await update.callback_query.edit_message_text(
-                    settings.MESSAGES['already_participating']
-                )
+                await self._answer(update, "❌ Розыгрыш не активен!", alert=True)
                 return
 
-            # Проверяем лимит участников
-            max_participants = giveaway.get('max_participants', 0)
-            if max_participants > 0:
-                current_count = await self.db.get_participants_count(giveaway_id)
-                if current_count >= max_participants:
-                    await update.callback_query.edit_message_text(
-                        "❌ Достигнуто максимальное количество участников!"
-                    )
+            # Дубли и лимит участников проверяет join_giveaway в одной транзакции.
+            # Заранее проверяем участие только перед дорогими проверками подписок и капчи
+            if giveaway.get('required_channels') or giveaway.get('captcha_enabled'):
+                if await self.db.is_participating(giveaway_id, user.id):
+                    await self._answer(update, settings.MESSAGES['already_participating'])
                     return
 
             # Проверяем подписки на каналы
@@ -95,9 +106,11 @@ class UserHandlers:
                         unsubscribed_channels = subscription_check['unsubscribed']
                         channels_text = '\n'.join([f"• @{ch}" for ch in unsubscribed_channels])
 
-                        await update.callback_query.edit_message_text(
+                        await self._answer(
+                            update,
                             f"{settings.MESSAGES['subscription_required']}\n\n{channels_text}\n\n"
-                            "После подписки нажмите кнопку снова."
+                            "После подписки нажмите кнопку снова.",
+                            alert=True
                         )
                         return
                 except (json.JSONDecodeError, TypeError):
@@ -105,6 +118,7 @@ class UserHandlers:
 
             # Проверяем капчу если включена
             if giveaway.get('captcha_enabled'):
+                await self._answer(update)
                 # Показываем капчу
                 from handlers.captcha import CaptchaHandler
                 captcha_handler = CaptchaHandler(self.db)
@@ -115,12 +129,7 @@ class UserHandlers:
             await self._add_participant_to_giveaway(update, context, giveaway_id, giveaway)
         except Exception as e:
             logger.error(f"Ошибка в participate_in_giveaway: {e}")
-            try:
-                await update.callback_query.edit_message_text(
-                    "❌ Произошла ошибка при регистрации участия. Попробуйте позже."
-                )
-            except:
-                pass
+            await self._answer(update, "❌ Произошла ошибка при регистрации участия. Попробуйте позже.", alert=True)
 
     async def _add_participant_to_giveaway(self, update: Update, context: ContextTypes.DEFAULT_TYPE,
                                            giveaway_id: str, giveaway: Dict):
@@ -138,113 +147,121 @@ class UserHandlers:
             # Проверяем реферальную ссылку
             referred_by = context.user_data.get('referred_by')
 
-            success = await self.db.add_participant(giveaway_id, user_data, referred_by)
-
-            if success:
-                participants_count = await self.db.get_participants_count(giveaway_id)
-
-                # Обновляем кнопку с новым количеством участников
-                keyboard = InlineKeyboards.participation_button(
-                    giveaway_id,
-                    participants_count,
-                    giveaway.get('show_participants_count', True),
-                    giveaway.get('button_text', 'Участвовать')
-                )
-
-                try:
-                    await update.callback_query.edit_message_reply_markup(reply_markup=keyboard)
-                except Exception as e:
-                    logger.warning(f"Не удалось обновить кнопку: {e}")
-
-                # Отправляем подтверждение
-                confirmation_text = (
-                    f"🎉 {settings.MESSAGES['participation_success']}\n\n"
-                    f"**Розыгрыш:** {giveaway['name']}\n"
-                    f"**Ваш номер участника:** #{participants_count}"
-                )
+            # Подтверждение и реферальная ссылка записываются в outbox той же
+            # транзакцией, что и участие: нажатие стоит одной записи в базу
+            result = await self.db.join_giveaway(
+                giveaway_id, user_data, referred_by,
+                confirmation=lambda number: self._join_confirmation(giveaway, user.id, number),
+                confirmation_batch_id=f"join_{giveaway_id}"
+            )
 
-                try:
-                    await context.bot.send_message(
-                        user.id,
-                        confirmation_text,
-                        parse_mode='Markdown'
+            if result.status == JoinStatus.ALREADY:
+                await self._answer(update, settings.MESSAGES['already_participating'])
+            elif result.status == JoinStatus.FULL:
+                await self._answer(update, "❌ Достигнуто максимальное количество участников!", alert=True)
+            elif result.status == JoinStatus.INACTIVE:
+                await self._answer(update, "❌ Розыгрыш не активен!", alert=True)
+            elif result.joined:
+                participants_count = result.participants_count
+
+                # Подтверждение сразу, не дожидаясь сообщения в личный чат
+                await self._answer(update, f"🎉 Вы участвуете! Ваш номер: #{participants_count}")
+                self.runtime.broadcaster.notify()
+
+                # Обновляем кнопку с новым количеством участников. Правки одного
+                # сообщения объединяются и отправляются фоновой задачей
+                if giveaway.get('show_participants_count', True):
+                    keyboard = InlineKeyboards.participation_button(
+                        giveaway_id,
+                        participants_count,
+                        True,
+                        giveaway.get('button_text', 'Участвовать')
+                    )
+                    self.runtime.button_updater.schedule(
+                        update.callback_query.message,
+                        update.callback_query.inline_message_id,
+                        keyboard,
+                        participants_count
                     )
-                except Exception as e:
-                    logger.warning(f"Не удалось отправить подтверждение участнику {user.id}: {e}")
-                    # Показываем подтверждение через edit_message_text
-                    try:
-                        await update.callback_query.edit_message_text(
-                            f"✅ Вы участвуете! Номер: #{participants_count}\n\n"
-                            f"**Розыгрыш:** {giveaway['name']}"
-                        )
-                    except:
-                        pass
-
-                # Если включена реферальная система, отправляем ссылку
-                if giveaway.get('referral_enabled'):
-                    try:
-                        bot_username = (await context.bot.get_me()).username
-                        referral_link = generate_referral_link(bot_username, giveaway_id, user.id)
-
-                        referral_text = (
-                            f"🔗 **Пригласите друзей и увеличьте шансы на победу!**\n\n"
-                            f"Ваша реферальная ссылка:\n`{referral_link}`\n\n"
-                            f"За каждого приглашенного друга ваши шансы увеличиваются в "
-                            f"{giveaway.get('referral_multiplier', 1.5)} раза!"
-                        )
-
-                        await context.bot.send_message(
-                            user.id,
-                            referral_text,
-                            parse_mode='Markdown'
-                        )
-                    except Exception as e:
-                        logger.warning(f"Не удалось отправить реферальную ссылку: {e}")
             else:
-                await update.callback_query.edit_message_text(
-                    "❌ Ошибка при регистрации участия. Попробуйте позже."
-                )
+                await self._answer(update, "❌ Розыгрыш не найден!", alert=True)
         except Exception as e:
             logger.error(f"Ошибка в _add_participant_to_giveaway: {e}")
-            try:
-                await update.callback_query.edit_message_text(
-                    "❌ Произошла ошибка при добавлении участника."
-                )
-            except:
-                pass
+            await self._answer(update, "❌ Произошла ошибка при добавлении участника.", alert=True)
+
+    def _join_confirmation(self, giveaway: Dict, user_id: int, participants_count: int) -> List[Dict]:
+        """Сообщения участнику после вступления: подтверждение и реферальная ссылка"""
+        messages = [{
+            'chat_id': user_id,
+            'text': (
+                f"🎉 {settings.MESSAGES['participation_success']}\n\n"
+                f"**Розыгрыш:** {giveaway['name']}\n"
+                f"**Ваш номер участника:** #{participants_count}"
+            ),
+            'parse_mode': 'Markdown'
+        }]
+
+        # Если включена реферальная система, отправляем ссылку
+        if giveaway.get('referral_enabled'):
+            referral_link = self.runtime.referral_link(giveaway['id'], user_id)
+
+            messages.append({
+                'chat_id': user_id,
+                'text': (
+                    f"🔗 **Пригласите друзей и увеличьте шансы на победу!**\n\n"
+                    f"Ваша реферальная ссылка:\n`{referral_link}`\n\n"
+                    f"За каждого приглашенного друга ваши шансы увеличиваются в "
+                    f"{giveaway.get('referral_multiplier', 1.5)} раза!"
+                ),
+                'parse_mode': 'Markdown'
+            })
+
+        return messages
 
     async def check_subscriptions(self, user_id: int, channels: List[str], bot) -> Dict:
         """Проверка подписок пользователя на каналы"""
-        all_subscribed = True
-        unsubscribed = []
-
-        for channel in channels:
-            try:
-                # Убираем @ если есть
-                channel_clean = channel.replace('@', '')
-
-                member = await bot.get_chat_member(f"@{channel_clean}", user_id)
-                if member.status in ['left', 'kicked']:
-                    all_subscribed = False
-                    unsubscribed.append(channel_clean)
-            except Exception as e:
-                logger.error(f"Error checking subscription for {channel}: {e}")
-                all_subscribed = False
-                unsubscribed.append(channel.replace('@', ''))
+        # Убираем @ если есть
+        channels_clean = [channel.replace('@', '') for channel in channels]
+
+        # Каналы, подписка на которые недавно подтверждена, повторно не проверяем
+        to_check = [
+            channel for channel in channels_clean
+            if not self.subscription_cache.get((channel, user_id))
+        ]
+
+        results = await asyncio.gather(*[
+            self._check_subscription(user_id, channel, bot) for channel in to_check
+        ])
+
+        unsubscribed = [channel for channel, subscribed in zip(to_check, results) if not subscribed]
 
         return {
-            'all_subscribed': all_subscribed,
+            'all_subscribed': not unsubscribed,
             'unsubscribed': unsubscribed
         }
 
+    async def _check_subscription(self, user_id: int, channel: str, bot) -> bool:
+        """Проверка подписки на один канал с ограничением числа одновременных запросов"""
+        try:
+            async with self.subscription_semaphore:
+                member = await bot.get_chat_member(f"@{channel}", user_id)
+        except Exception as e:
+            logger.error(f"Error checking subscription for {channel}: {e}")
+            return False
+
+        if member.status in ['left', 'kicked']:
+            return False
+
+        self.subscription_cache.set((channel, user_id), True)
+        return True
+
     async def show_user_participations(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Показать участия пользователя"""
         user_id = update.effective_user.id
 
         try:
             # Получаем участия пользователя
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.read() as db:
                 cursor = await db.execute('''
                     SELECT g.name, g.status, p.joined_at, g.id
                     FROM participants p
@@ -283,8 +300,7 @@ class UserHandlers:
 
         try:
             # Получаем победы пользователя
-            import aiosqlite
-            async with aiosqlite.connect(self.db.db_path) as db:
+            async with self.db.pool.read() as db:
                 cursor = await db.execute('''
                     SELECT g.name, w.place, w.selected_at, w.data_collected, w.prize_sent
                     FROM winners w
@@ -22,6 +22,14 @@ class InlineKeyboards:
         ]
         return InlineKeyboardMarkup(keyboard)
 
+    @staticmethod
+    def statistics_menu():
+        """Меню экрана статистики"""
+        keyboard = [
+            [InlineKeyboardButton(f"{settings.EMOJIS['back']} Назад", callback_data="admin_menu")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+
     @staticmethod
     def giveaway_management(giveaway_id: str, status: str = "created"):
         """Меню управления розыгрышем"""
@@ -57,7 +65,8 @@ class InlineKeyboards:
                     InlineKeyboardButton(f"{settings.EMOJIS['edit']} Редактировать",
                                          callback_data=f"edit_{giveaway_id}"),
                     InlineKeyboardButton(f"{settings.EMOJIS['export']} Экспорт", callback_data=f"export_{giveaway_id}")
-                ]
+                ],
+                [InlineKeyboardButton(f"📈 Рост участников", callback_data=f"growth_{giveaway_id}")]
             ])
         elif status == "finished":
             keyboard.extend([
@@ -70,7 +79,8 @@ class InlineKeyboards:
                     InlineKeyboardButton(f"{settings.EMOJIS['participants']} Участники",
                                          callback_data=f"participants_{giveaway_id}"),
                     InlineKeyboardButton(f"{settings.EMOJIS['export']} Экспорт", callback_data=f"export_{giveaway_id}")
-                ]
+                ],
+                [InlineKeyboardButton(f"📈 Рост участников", callback_data=f"growth_{giveaway_id}")]
             ])
 
         keyboard.extend([
@@ -85,21 +95,21 @@ class InlineKeyboards:
 
     @staticmethod
     def giveaway_navigation(current_index: int, total_count: int, prefix: str = "giveaway"):
-        """Навигация между розыгрышами"""
+        """Навигация между розыгрышами (переходы относительно текущего)"""
         keyboard = []
         nav_buttons = []
 
         if current_index > 1:
-            nav_buttons.append(InlineKeyboardButton("⏮️", callback_data=f"{prefix}_nav_0"))
+            nav_buttons.append(InlineKeyboardButton("⏮️", callback_data=f"{prefix}_nav_first"))
         if current_index > 0:
-            nav_buttons.append(InlineKeyboardButton("◀️", callback_data=f"{prefix}_nav_{current_index - 1}"))
+            nav_buttons.append(InlineKeyboardButton("◀️", callback_data=f"{prefix}_nav_prev"))
 
         nav_buttons.append(InlineKeyboardButton(f"{current_index + 1}/{total_count}", callback_data="noop"))
 
         if current_index < total_count - 1:
-            nav_buttons.append(InlineKeyboardButton("▶️", callback_data=f"{prefix}_nav_{current_index + 1}"))
+            nav_buttons.append(InlineKeyboardButton("▶️", callback_data=f"{prefix}_nav_next"))
         if current_index < total_count - 2:
-            nav_buttons.append(InlineKeyboardButton("⏭️", callback_data=f"{prefix}_nav_{total_count - 1}"))
+            nav_buttons.append(InlineKeyboardButton("⏭️", callback_data=f"{prefix}_nav_last"))
 
         if nav_buttons:
             keyboard.append(nav_buttons)
@@ -143,6 +153,16 @@ class InlineKeyboards:
         ]
         return InlineKeyboardMarkup(keyboard)
 
+    @staticmethod
+    def export_options(giveaway_id: str):
+        """Форматы экспорта участников"""
+        keyboard = [
+            [InlineKeyboardButton("📄 CSV", callback_data=f"export_csv_{giveaway_id}")],
+            [InlineKeyboardButton("🗜️ CSV (сжатый .gz)", callback_data=f"export_gzip_{giveaway_id}")],
+            [InlineKeyboardButton(f"{settings.EMOJIS['back']} Назад", callback_data=f"manage_{giveaway_id}")]
+        ]
+        return InlineKeyboardMarkup(keyboard)
+
     @staticmethod
     def button_attachment_type(giveaway_id: str):
         """Тип прикрепления кнопки"""
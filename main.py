@@ -1,14 +1,25 @@
 import logging
 import asyncio
+import signal
 from telegram.ext import Application, CommandHandler, CallbackQueryHandler, MessageHandler
 from telegram.ext import filters
-from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton, Update
 
 from config.settings import settings
 from database.models import DatabaseManager
+from database.outbox import Outbox
+from database.persistence import SQLitePersistence
 from handlers.admin import AdminHandlers
 from handlers.user import UserHandlers
 from handlers.giveaway import GiveawayHandlers
+from handlers.export import ExportHandlers
+from handlers.growth import GrowthHandlers
+from utils.broadcast import Broadcaster
+from utils.button_updater import ButtonUpdater
+from utils.filters import AdminFilter
+from utils.router import CallbackRouter, GIVEAWAY_ID_RE
+from utils.runtime import BotRuntime
+from utils.update_processor import OrderedUpdateProcessor
 
 # Настройка логирования
 logging.basicConfig(
@@ -18,13 +29,36 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+
 class GiveawayBot:
     def __init__(self):
         self.token = settings.BOT_TOKEN
         self.db = DatabaseManager()
-        self.admin_handlers = AdminHandlers(self.db)
-        self.user_handlers = UserHandlers(self.db)
-        self.giveaway_handlers = GiveawayHandlers(self.db)
+        self.broadcaster = Broadcaster(
+            Outbox(self.db),
+            workers=settings.BROADCAST_WORKERS,
+            global_rate=settings.BROADCAST_GLOBAL_RATE,
+            per_chat_interval=settings.BROADCAST_PER_CHAT_INTERVAL,
+            max_attempts=settings.BROADCAST_MAX_ATTEMPTS,
+            poll_interval=settings.BROADCAST_POLL_INTERVAL,
+            retention_days=settings.BROADCAST_RETENTION_DAYS
+        )
+        self.button_updater = ButtonUpdater(settings.BUTTON_UPDATE_INTERVAL)
+        self.runtime = BotRuntime(self.broadcaster, self.button_updater)
+        self.admin_handlers = AdminHandlers(self.db, self.runtime)
+        self.user_handlers = UserHandlers(self.db, self.runtime)
+        self.giveaway_handlers = GiveawayHandlers(self.db, self.runtime)
+        self.export_handlers = ExportHandlers(self.db)
+        self.growth_handlers = GrowthHandlers(self.db)
+        self.admin_filter = AdminFilter(self.db)
+
+        self.router = CallbackRouter(self.db.is_admin_cached)
+        self.router.add_exact('create_giveaway', self.simple_create_giveaway, admin_only=True)
+        self.admin_handlers.register_routes(self.router)
+        self.user_handlers.register_routes(self.router)
+        self.giveaway_handlers.register_routes(self.router)
+        self.export_handlers.register_routes(self.router)
+        self.growth_handlers.register_routes(self.router)
 
     async def start_command(self, update, context):
         """Обработчик команды /start"""
@@ -42,7 +76,7 @@ class GiveawayBot:
             })
 
             # Проверяем, является ли пользователь администратором
-            is_admin = await self.db.is_admin(user.id)
+            is_admin = self.db.is_admin_cached(user.id)
             logger.info(f"Пользователь {user.id} - администратор: {is_admin}")
 
             if is_admin:
@@ -54,11 +88,28 @@ class GiveawayBot:
             logger.error(f"Ошибка в start_command: {e}")
             await update.message.reply_text("❌ Произошла ошибка при запуске. Попробуйте позже.")
 
+    async def recount_command(self, update, context):
+        """Обработчик команды /recount - пересчет счетчиков участников и статистики (только для администраторов)"""
+        try:
+            user_id = update.effective_user.id
+            giveaway_id = context.args[0] if context.args else None
+            fixed_count = await self.db.repair_participants_count(giveaway_id)
+            if not giveaway_id:
+                await self.db.rebuild_statistics()
+            logger.info(f"Администратор {user_id} пересчитал счетчики участников: исправлено {fixed_count}")
+
+            await update.message.reply_text(
+                f"✅ Счетчики участников пересчитаны.\nИсправлено розыгрышей: {fixed_count}"
+            )
+        except Exception as e:
+            logger.error(f"Ошибка в recount_command: {e}")
+            await update.message.reply_text("❌ Ошибка пересчета счетчиков участников.")
+
     async def simple_create_giveaway(self, update, context):
         """Упрощенное создание розыгрыша"""
         try:
             user_id = update.effective_user.id
-            is_admin = await self.db.is_admin(user_id)
+            is_admin = self.db.is_admin_cached(user_id)
 
             if not is_admin:
                 await update.callback_query.answer("❌ У вас нет прав администратора!", show_alert=True)
@@ -66,7 +117,7 @@ class GiveawayBot:
 
             # Создаем простой розыгрыш с базовыми параметрами
             giveaway_data = {
-                'name': f'Розыгрыш #{len(await self.db.get_giveaways_by_admin(user_id)) + 1}',
+                'name': f'Розыгрыш #{await self.db.count_giveaways_by_admin(user_id) + 1}',
                 'description': 'Описание можно изменить позже',
                 'admin_id': user_id
             }
@@ -100,45 +151,9 @@ class GiveawayBot:
 
             logger.info(f"Callback от пользователя {user_id}: {data}")
 
-            # Отвечаем на callback query
-            await query.answer()
-
-            # Проверяем права администратора для admin команд
-            admin_commands = [
-                'create_giveaway', 'my_giveaways', 'manage_', 'edit_',
-                'publish_', 'delete_', 'draw_', 'settings', 'statistics',
-                'export_', 'channels_', 'protection_', 'schedule_',
-                'advanced_', 'participants_', 'winners_', 'redraw_'
-            ]
-
-            is_admin_command = any(data.startswith(cmd) for cmd in admin_commands)
-
-            if is_admin_command:
-                is_admin = await self.db.is_admin(user_id)
-                if not is_admin:
-                    await query.answer("❌ У вас нет прав администратора!", show_alert=True)
-                    return
-
-            # Маршрутизация callback запросов
-            if data == 'admin_menu':
-                await self.admin_handlers.admin_start(update, context)
-            elif data == 'create_giveaway':
-                await self.simple_create_giveaway(update, context)
-            elif data == 'my_giveaways':
-                await self.admin_handlers.my_giveaways(update, context)
-            elif data.startswith('giveaway_nav_'):
-                await self.admin_handlers.navigate_giveaways(update, context)
-            elif data.startswith('manage_'):
-                await self.admin_handlers.manage_giveaway(update, context)
-            elif data.startswith('publish_'):
-                await self.admin_handlers.publish_giveaway(update, context)
-            elif data.startswith('publish_instant_'):
-                await self.admin_handlers.instant_publish(update, context)
-            elif data.startswith('participate_'):
-                await self.user_handlers.participate_in_giveaway(update, context)
-            elif data.startswith('draw_'):
-                await self.giveaway_handlers.draw_winners(update, context)
-            else:
+            # Маршрутизация callback запросов; права проверяет маршрут
+            if not await self.router.dispatch(update, context):
+                await query.answer()
                 await query.edit_message_text("🔧 Функция в разработке")
 
         except Exception as e:
@@ -157,7 +172,7 @@ class GiveawayBot:
 
             logger.info(f"Текстовое сообщение от {user_id}: {text}")
 
-            is_admin = await self.db.is_admin(user_id)
+            is_admin = self.db.is_admin_cached(user_id)
 
             if is_admin:
                 if text == f"{settings.EMOJIS['create']} Создать розыгрыш":
@@ -197,12 +212,34 @@ class GiveawayBot:
             logger.error(f"Ошибка в text_message_handler: {e}")
             await update.message.reply_text("❌ Произошла ошибка при обработке сообщения.")
 
+    def ordering_keys(self, update) -> list:
+        """Ключи упорядочивания обновления.
+
+        Обновления одного пользователя обрабатываются по очереди (двойное
+        нажатие «Участвовать» не выполняется параллельно), действия
+        администраторов над одним розыгрышем - тоже.
+        """
+        keys = []
+
+        if isinstance(update, Update) and update.effective_user:
+            keys.append(('user', update.effective_user.id))
+
+            data = update.callback_query.data if update.callback_query else None
+            if data and not data.startswith('participate_'):
+                # ID розыгрыша в конце callback_data: manage_<id>, draw_<id>, export_csv_<id>...
+                giveaway_id = data.rsplit('_', 1)[-1]
+                if GIVEAWAY_ID_RE.fullmatch(giveaway_id):
+                    keys.append(('giveaway', giveaway_id))
+
+        return keys
+
     def setup_handlers(self, application):
         """Настройка обработчиков"""
         logger.info("Настройка обработчиков...")
 
         # Основные обработчики
         application.add_handler(CommandHandler('start', self.start_command))
+        application.add_handler(CommandHandler('recount', self.recount_command, filters=self.admin_filter))
         application.add_handler(CallbackQueryHandler(self.callback_query_handler))
 
         # Обработчик текстовых сообщений (должен быть последним)
@@ -225,6 +262,57 @@ class GiveawayBot:
             except:
                 pass
 
+    async def post_init(self, application):
+        """Запуск фоновых задач после инициализации бота"""
+        # Продолжает и рассылки, прерванные предыдущей остановкой
+        await self.broadcaster.start(application.bot)
+        await self.button_updater.start(application.bot)
+
+    async def post_shutdown(self, application):
+        """Освобождение ресурсов при остановке бота"""
+        await self.button_updater.stop()
+        await self.broadcaster.stop()
+        self.giveaway_handlers.shutdown()
+
+    async def start_updates(self, application):
+        """Получение обновлений в режиме, выбранном в настройках.
+
+        Накопившиеся за время перезапуска обновления не сбрасываются.
+        """
+        if settings.RUN_MODE == 'webhook':
+            webhook_url = f"{settings.WEBHOOK_URL.rstrip('/')}/{settings.WEBHOOK_PATH.strip('/')}"
+            await application.updater.start_webhook(
+                listen=settings.WEBHOOK_LISTEN,
+                port=settings.WEBHOOK_PORT,
+                url_path=settings.WEBHOOK_PATH.strip('/'),
+                webhook_url=webhook_url,
+                secret_token=settings.WEBHOOK_SECRET_TOKEN,
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                drop_pending_updates=False
+            )
+            logger.info(
+                f"🌐 Webhook: {webhook_url} (порт {settings.WEBHOOK_PORT}, "
+                f"до {settings.WEBHOOK_MAX_CONNECTIONS} соединений)"
+            )
+        else:
+            await application.updater.start_polling(drop_pending_updates=False)
+            logger.info("🔄 Режим polling")
+
+    async def wait_for_stop_signal(self):
+        """Ожидание SIGINT/SIGTERM"""
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop_event.set)
+            except (NotImplementedError, RuntimeError):
+                # Windows: остановка по Ctrl+C прерывает asyncio.run, очистка выполнится в finally
+                pass
+
+        await stop_event.wait()
+        logger.info("🛑 Получен сигнал остановки")
+
     async def run(self):
         """Запуск бота"""
         try:
@@ -237,11 +325,21 @@ class GiveawayBot:
             logger.info("✅ База данных инициализирована успешно")
 
             # Создание приложения
-            application = Application.builder().token(self.token).build()
-
-            # Проверяем подключение к боту
-            bot_info = await application.bot.get_me()
-            logger.info(f"🤖 Подключение к боту успешно: @{bot_info.username}")
+            builder = (
+                Application.builder()
+                .token(self.token)
+                .concurrent_updates(OrderedUpdateProcessor(settings.MAX_CONCURRENT_UPDATES, self.ordering_keys))
+                .persistence(SQLitePersistence(
+                    self.db,
+                    settings.PERSISTENCE_UPDATE_INTERVAL,
+                    settings.PERSISTENCE_CACHE_SIZE,
+                    settings.PERSISTENCE_CACHE_TTL
+                ))
+            )
+            if settings.BOT_API_BASE_URL:
+                # Локальный Bot API сервер или заглушка из scripts/webhook_harness.py
+                builder = builder.base_url(f"{settings.BOT_API_BASE_URL.rstrip('/')}/bot")
+            application = builder.build()
 
             # Настройка обработчиков
             self.setup_handlers(application)
@@ -249,9 +347,32 @@ class GiveawayBot:
             # Обработчик ошибок
             application.add_error_handler(self.error_handler)
 
-            # Запуск бота
-            logger.info("🟢 Бот запущен и готов к работе!")
-            await application.run_polling(drop_pending_updates=True)
+            # Жизненный цикл управляется вручную: run_polling/run_webhook
+            # запускают собственный event loop и не работают внутри asyncio.run
+            try:
+                async with application:
+                    # initialize() уже выполнил get_me, повторный запрос не нужен
+                    bot_info = application.bot.bot
+                    self.runtime.set_bot_identity(bot_info)
+                    logger.info(f"🤖 Подключение к боту успешно: @{bot_info.username}")
+
+                    await self.post_init(application)
+                    try:
+                        await application.start()
+                        await self.start_updates(application)
+
+                        logger.info("🟢 Бот запущен и готов к работе!")
+                        await self.wait_for_stop_signal()
+                    finally:
+                        if application.updater.running:
+                            await application.updater.stop()
+                        if application.running:
+                            await application.stop()
+                        await self.post_shutdown(application)
+            finally:
+                # База закрывается после shutdown(): он сохраняет состояние обработчиков
+                logger.info("Закрытие соединений с базой данных...")
+                await self.db.close()
 
         except Exception as e:
             logger.error(f"❌ Критическая ошибка при запуске: {e}")
@@ -0,0 +1,201 @@
+"""
+Локальный стенд для проверки бота в режиме webhook без Telegram.
+
+Две команды:
+
+  stub-api  - заглушка Bot API: отвечает успехом на getMe, setWebhook,
+              sendMessage, editMessage* и т.п., ничего никуда не отправляя.
+  post      - отправка синтетических обновлений (/start и нажатия кнопки
+              участия) на webhook бота с замером задержки.
+
+Пример:
+
+  python scripts/webhook_harness.py stub-api --port 8081
+  RUN_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443 WEBHOOK_SECRET_TOKEN=test \\
+      BOT_API_BASE_URL=http://127.0.0.1:8081 python run.py
+  python scripts/webhook_harness.py post --url http://127.0.0.1:8443/telegram \\
+      --secret test --count 2000 --concurrency 40 --giveaway <id>
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import statistics
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import httpx
+
+STUB_BOT_USER = {'id': 1000000, 'is_bot': True, 'first_name': 'Giveaway Bot', 'username': 'giveaway_stub_bot'}
+
+
+class StubBotApiHandler(BaseHTTPRequestHandler):
+    """Заглушка Bot API: /bot<token>/<method>"""
+
+    message_ids = itertools.count(1)
+    calls = Counter()
+    lock = threading.Lock()
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        method = self.path.rsplit('/', 1)[-1].split('?', 1)[0]
+        params = self._read_params()
+
+        with self.lock:
+            self.calls[method] += 1
+
+        if method == 'getMe':
+            result = STUB_BOT_USER
+        elif method == 'getUpdates':
+            # Имитация long polling без обновлений
+            time.sleep(min(float(params.get('timeout', 0) or 0), 1.0))
+            result = []
+        elif method == 'getChatMember':
+            result = {'status': 'member', 'user': {'id': int(params.get('user_id', 0)),
+                                                    'is_bot': False, 'first_name': 'User'}}
+        elif method.startswith(('send', 'edit')):
+            chat_id = params.get('chat_id')
+            result = {
+                'message_id': next(self.message_ids),
+                'date': int(time.time()),
+                'chat': {'id': int(chat_id) if str(chat_id).lstrip('-').isdigit() else 0, 'type': 'private'},
+                'text': params.get('text', '')
+            }
+            if method.startswith('edit') and params.get('inline_message_id'):
+                result = True
+        else:
+            result = True
+
+        body = json.dumps({'ok': True, 'result': result}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_params(self) -> dict:
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        content_type = self.headers.get('Content-Type', '')
+
+        if 'json' in content_type and raw:
+            return json.loads(raw)
+        if raw:
+            return {key: values[0] for key, values in parse_qs(raw.decode()).items()}
+        return {}
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_stub_api(port: int):
+    """Запуск заглушки Bot API"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubBotApiHandler)
+    print(f"Заглушка Bot API: http://127.0.0.1:{port} (BOT_API_BASE_URL)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Вызовы: {dict(StubBotApiHandler.calls)}")
+
+
+def synthetic_updates(count: int, giveaway_id: str = None, first_user_id: int = 10_000_000):
+    """Синтетические обновления: /start от новых пользователей и нажатия кнопки участия"""
+    for update_id in range(1, count + 1):
+        user_id = first_user_id + update_id
+        user = {'id': user_id, 'is_bot': False, 'first_name': f'User{update_id}', 'username': f'user{user_id}'}
+        chat = {'id': user_id, 'type': 'private', 'first_name': user['first_name']}
+
+        if giveaway_id and update_id % 2 == 0:
+            yield {
+                'update_id': update_id,
+                'callback_query': {
+                    'id': str(update_id),
+                    'from': user,
+                    'chat_instance': str(user_id),
+                    'data': f'participate_{giveaway_id}',
+                    'message': {
+                        'message_id': 1,
+                        'date': int(time.time()),
+                        'chat': {'id': -1001000000000, 'type': 'channel', 'title': 'Stub channel'}
+                    }
+                }
+            }
+        else:
+            yield {
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id,
+                    'date': int(time.time()),
+                    'chat': chat,
+                    'from': user,
+                    'text': '/start',
+                    'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}]
+                }
+            }
+
+
+async def post_updates(url: str, secret: str, count: int, concurrency: int, giveaway_id: str = None):
+    """Отправка синтетических обновлений на webhook и вывод статистики"""
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    updates = synthetic_updates(count, giveaway_id)
+    latencies = []
+    statuses = Counter()
+
+    async def sender(client: httpx.AsyncClient):
+        for update in updates:
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=update, headers=headers)
+                statuses[response.status_code] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        await asyncio.gather(*[sender(client) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Отправлено: {len(latencies)} за {elapsed:.2f} с ({len(latencies) / elapsed:.0f} обновлений/с)")
+    print(f"Ответы: {dict(statuses)}")
+    if latencies:
+        print(
+            f"Задержка: p50={statistics.median(latencies) * 1000:.1f} мс, "
+            f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f} мс, "
+            f"max={latencies[-1] * 1000:.1f} мс"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    stub = commands.add_parser('stub-api', help='заглушка Bot API')
+    stub.add_argument('--port', type=int, default=8081)
+
+    post = commands.add_parser('post', help='отправка синтетических обновлений')
+    post.add_argument('--url', default='http://127.0.0.1:8443/telegram')
+    post.add_argument('--secret', default='')
+    post.add_argument('--count', type=int, default=1000)
+    post.add_argument('--concurrency', type=int, default=20)
+    post.add_argument('--giveaway', default=None, help='ID розыгрыша для нажатий кнопки участия')
+
+    args = parser.parse_args()
+
+    if args.command == 'stub-api':
+        run_stub_api(args.port)
+    else:
+        asyncio.run(post_updates(args.url, args.secret, args.count, args.concurrency, args.giveaway))
+
+
+if __name__ == '__main__':
+    main()
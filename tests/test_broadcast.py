@@ -0,0 +1,165 @@
+import asyncio
+
+from telegram.error import Forbidden, RetryAfter, TimedOut
+
+from database.models import DatabaseManager
+from database.outbox import Outbox
+from utils.broadcast import Broadcaster
+
+
+class FakeBot:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.sent = []
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(self.delay)
+        self.sent.append(text)
+
+
+class ScriptedBot(FakeBot):
+    """Бот, который для некоторых чатов сначала возвращает ошибки"""
+
+    def __init__(self, errors):
+        super().__init__(delay=0)
+        self.errors = errors
+
+    async def send_message(self, chat_id, text, **kwargs):
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        await super().send_message(chat_id, text, **kwargs)
+
+
+async def wait_until_delivered(outbox: Outbox, batch_id: str):
+    while True:
+        stats = await outbox.batch_stats(batch_id)
+        if not stats[Outbox.PENDING] and not stats[Outbox.SENDING]:
+            return stats
+        await asyncio.sleep(0.02)
+
+
+def test_delivery_retries_and_failures(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        outbox = Outbox(db)
+        broadcaster = Broadcaster(outbox, workers=4, global_rate=1000, per_chat_interval=0,
+                                  retry_base_delay=0.05)
+        bot = ScriptedBot({
+            1: [Forbidden('bot was blocked by the user')],
+            2: [RetryAfter(1)],
+            3: [TimedOut()],
+        })
+
+        await broadcaster.start(bot)
+        messages = [{'chat_id': chat_id, 'text': f'{chat_id}'} for chat_id in (1, 2, 3)]
+        messages += [{'chat_id': 4, 'text': f'4-{index}'} for index in range(5)]
+        await broadcaster.send(messages, batch_id='test')
+
+        stats = await asyncio.wait_for(wait_until_delivered(outbox, 'test'), timeout=10)
+        await broadcaster.stop()
+        await db.close()
+
+        assert stats[Outbox.SENT] == 7
+        assert stats[Outbox.FAILED] == 1
+        assert broadcaster.stats['rate_limited'] == 1
+        assert broadcaster.stats['retried'] == 1
+        # Сообщения одному чату доставляются по порядку
+        assert [text for text in bot.sent if text.startswith('4-')] == [f'4-{index}' for index in range(5)]
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=30))
+
+
+def test_stop_finishes_deliveries_and_requeues_the_rest(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        outbox = Outbox(db)
+        broadcaster = Broadcaster(outbox, workers=8, global_rate=1000, per_chat_interval=0)
+        bot = FakeBot(delay=0.01)
+
+        await broadcaster.send([{'chat_id': i, 'text': str(i)} for i in range(2000)])
+        await broadcaster.start(bot)
+        await asyncio.sleep(0.2)
+        await asyncio.wait_for(broadcaster.stop(), timeout=5)
+
+        async with db.pool.read() as conn:
+            cursor = await conn.execute('SELECT status, text FROM outbox')
+            rows = await cursor.fetchall()
+        await db.close()
+
+        sent = {text for status, text in rows if status == Outbox.SENT}
+        statuses = {status for status, _ in rows}
+
+        assert bot.sent
+        assert sent == set(bot.sent)
+        assert statuses <= {Outbox.SENT, Outbox.PENDING}
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=30))
+
+
+def test_dispatcher_purges_old_sent_and_failed_messages(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        outbox = Outbox(db)
+        broadcaster = Broadcaster(outbox, workers=1, poll_interval=0.05, retention_days=7, purge_interval=0.05)
+
+        async with db.pool.write() as conn:
+            await conn.executemany('''
+                INSERT INTO outbox (chat_id, text, status, next_attempt_at, created_at, sent_at)
+                VALUES (1, ?, ?, 0, datetime('now', ?), ?)
+            ''', [
+                ('old sent', Outbox.SENT, '-30 days', '2000-01-01 00:00:00'),
+                ('old failed', Outbox.FAILED, '-30 days', None),
+                ('new sent', Outbox.SENT, '-1 days', None),
+                ('new failed', Outbox.FAILED, '-1 days', None),
+            ])
+
+        await broadcaster.start(FakeBot(delay=0))
+        await asyncio.sleep(0.1)
+
+        # Сообщения, устаревшие уже во время работы, тоже удаляются
+        async with db.pool.write() as conn:
+            await conn.execute("UPDATE outbox SET created_at = datetime('now', '-30 days') WHERE text = 'new failed'")
+        await asyncio.sleep(0.2)
+        await broadcaster.stop()
+
+        async with db.pool.read() as conn:
+            cursor = await conn.execute('SELECT text FROM outbox ORDER BY id')
+            remaining = [row[0] for row in await cursor.fetchall()]
+        await db.close()
+
+        assert remaining == ['new sent']
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=30))
+
+
+def test_join_writes_confirmation_in_same_transaction(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        try:
+            outbox = Outbox(db)
+            giveaway_id = await db.create_giveaway({'name': 'test', 'admin_id': 1})
+            await db.update_giveaway(giveaway_id, {'status': 'published'})
+
+            def confirmation(number):
+                return [{'chat_id': 10, 'text': f'#{number}'}]
+
+            user = {'user_id': 10, 'username': 'user'}
+            first = await db.join_giveaway(giveaway_id, user, confirmation=confirmation,
+                                           confirmation_batch_id='join')
+            again = await db.join_giveaway(giveaway_id, user, confirmation=confirmation,
+                                           confirmation_batch_id='join')
+
+            assert first.joined and not again.joined
+            assert (await outbox.batch_stats('join'))[Outbox.PENDING] == 1
+            async with db.pool.read() as conn:
+                cursor = await conn.execute('SELECT text FROM outbox')
+                assert await cursor.fetchall() == [('#1',)]
+        finally:
+            await db.close()
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=10))
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from database.models import DatabaseManager
+from database.persistence import SQLitePersistence
+
+
+async def stored_rows(db: DatabaseManager) -> dict:
+    async with db.pool.read() as conn:
+        cursor = await conn.execute("SELECT key, data FROM persistence WHERE kind = 'user'")
+        return {int(key): json.loads(data) for key, data in await cursor.fetchall()}
+
+
+def test_loaded_users_are_bounded_and_reloaded_after_eviction(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        persistence = SQLitePersistence(db, cache_size=3)
+
+        loads = []
+        original_load = persistence._load
+
+        async def counting_load(kind, key):
+            loads.append((kind, key))
+            return await original_load(kind, key)
+
+        persistence._load = counting_load
+
+        users = {user_id: {} for user_id in range(1, 11)}
+        for user_id, data in users.items():
+            await persistence.refresh_user_data(user_id, data)
+            data['step'] = 1
+            await persistence.update_user_data(user_id, data)
+
+        assert len(persistence._stored) <= 3
+        assert len(loads) == 10
+
+        # Вытесненный пользователь снова читается из базы
+        reloaded = {}
+        await persistence.refresh_user_data(1, reloaded)
+        assert reloaded == {'step': 1}
+        assert loads[-1] == ('user', '1')
+
+        # Недавний пользователь не перечитывается
+        loads.clear()
+        await persistence.refresh_user_data(10, users[10])
+        assert loads == []
+
+        # Изменения всех пользователей одного прохода записываются, хотя
+        # их больше, чем помещается в кэш
+        for user_id, data in users.items():
+            data['step'] = 2
+        await asyncio.gather(*[
+            persistence.update_user_data(user_id, data) for user_id, data in users.items()
+        ])
+        await persistence.flush()
+
+        rows = await stored_rows(db)
+        await db.close()
+
+        assert rows == {user_id: {'step': 2} for user_id in users}
+        assert len(persistence._stored) <= 3
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=30))
+
+
+def test_evicted_user_with_empty_data_is_deleted(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / 'bot.db'))
+        await db.init_database()
+        persistence = SQLitePersistence(db, cache_size=1)
+
+        for user_id in (1, 2):
+            await persistence.refresh_user_data(user_id, {})
+            await persistence.update_user_data(user_id, {'value': user_id})
+
+        # Пользователь 1 вытеснен; очистка его данных все равно удаляет строку
+        await persistence.refresh_user_data(1, {})
+        await persistence.update_user_data(1, {})
+        await persistence.drop_user_data(2)
+
+        rows = await stored_rows(db)
+        await db.close()
+
+        assert rows == {}
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=30))
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from database.pool import ConnectionPool
+
+
+def run(coro):
+    return asyncio.run(asyncio.wait_for(coro, timeout=10))
+
+
+async def open_pool(tmp_path) -> ConnectionPool:
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), readers_count=1)
+    await pool.open()
+    await pool.submit(lambda conn: conn.execute('CREATE TABLE items (value INTEGER)'))
+    return pool
+
+
+async def count_items(pool: ConnectionPool) -> int:
+    async with pool.read() as conn:
+        cursor = await conn.execute('SELECT COUNT(*) FROM items')
+        return (await cursor.fetchone())[0]
+
+
+def test_write_cancelled_while_queued_does_not_block_writer(tmp_path):
+    async def scenario():
+        pool = await open_pool(tmp_path)
+        holding = asyncio.Event()
+        release = asyncio.Event()
+
+        async def holder():
+            async with pool.write() as conn:
+                await conn.execute('INSERT INTO items VALUES (1)')
+                holding.set()
+                await release.wait()
+
+        async def queued():
+            async with pool.write() as conn:
+                await conn.execute('INSERT INTO items VALUES (2)')
+
+        holder_task = asyncio.create_task(holder())
+        await holding.wait()
+
+        # Второе задание ждет в очереди за первым и отменяется
+        queued_task = asyncio.create_task(queued())
+        await asyncio.sleep(0.05)
+        queued_task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued_task
+
+        release.set()
+        await holder_task
+
+        async with pool.write() as conn:
+            await conn.execute('INSERT INTO items VALUES (3)')
+
+        assert await count_items(pool) == 2
+        await pool.close()
+
+    run(scenario())
+
+
+def test_failed_transaction_control_keeps_writer_alive(tmp_path):
+    async def scenario():
+        pool = await open_pool(tmp_path)
+
+        async def breaks_transaction(conn):
+            # Откат всей транзакции уничтожает SAVEPOINT, и RELEASE падает
+            await conn.execute('INSERT INTO items VALUES (1)')
+            await conn.execute('ROLLBACK')
+
+        with pytest.raises(Exception):
+            await pool.submit(breaks_transaction)
+
+        await pool.submit(lambda conn: conn.execute('INSERT INTO items VALUES (2)'))
+
+        assert await count_items(pool) == 1
+        await pool.close()
+
+    run(scenario())
@@ -0,0 +1,94 @@
+"""Горячие запросы не должны деградировать до полного просмотра таблиц (SCAN).
+
+Запросы не копируются в тест: реальные методы вызываются на пустой базе
+после init_database, а выполненный ими SQL перехватывается через trace
+callback соединений пула и проверяется EXPLAIN QUERY PLAN.
+"""
+import asyncio
+import sqlite3
+from types import SimpleNamespace
+
+import pytest
+
+from database.models import DatabaseManager
+from database.queries import DatabaseQueries
+from handlers.user import UserHandlers
+
+GIVEAWAY_ID = '00000000-0000-4000-8000-000000000000'
+USER_ID = 42
+
+
+class FakeMessage:
+    async def reply_text(self, *args, **kwargs):
+        pass
+
+
+async def trace_statements(db: DatabaseManager, statements: list):
+    def trace(sql: str):
+        statement = sql.strip()
+        if statement.upper().startswith(('SELECT', 'UPDATE', 'DELETE', 'WITH')):
+            statements.append(statement)
+
+    for conn in [db.pool._writer] + db.pool._all_readers:
+        await conn.set_trace_callback(trace)
+
+
+async def collect_hot_queries(db_path: str):
+    db = DatabaseManager(db_path)
+    await db.init_database()
+    queries = DatabaseQueries(db)
+    handlers = UserHandlers(db, runtime=None)
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=USER_ID), message=FakeMessage())
+
+    calls = {
+        'get_admin_giveaway_page': lambda: db.get_admin_giveaway_page(USER_ID, 'next', ('2024-01-01', GIVEAWAY_ID)),
+        'show_user_participations': lambda: handlers.show_user_participations(update, None),
+        'show_user_wins': lambda: handlers.show_user_wins(update, None),
+        'get_winner_info': lambda: queries.get_winner_info(USER_ID),
+        'delete_giveaway': lambda: db.delete_giveaway(GIVEAWAY_ID),
+        'iter_export_participants': lambda: queries.export_participants(GIVEAWAY_ID),
+        'get_draw_snapshot': lambda: queries.get_draw_snapshot(GIVEAWAY_ID),
+        'get_participants_by_ids': lambda: queries.get_participants_by_ids(GIVEAWAY_ID, [1, 2, 3]),
+    }
+
+    collected = {}
+    for name, call in calls.items():
+        statements = []
+        await trace_statements(db, statements)
+        await call()
+        collected[name] = statements
+
+    await db.close()
+    return collected
+
+
+@pytest.fixture(scope='module')
+def hot_queries(tmp_path_factory):
+    db_path = str(tmp_path_factory.mktemp('plans') / 'bot.db')
+    collected = asyncio.run(collect_hot_queries(db_path))
+    return db_path, collected
+
+
+@pytest.mark.parametrize('name', [
+    'get_admin_giveaway_page',
+    'show_user_participations',
+    'show_user_wins',
+    'get_winner_info',
+    'delete_giveaway',
+    'iter_export_participants',
+    'get_draw_snapshot',
+    'get_participants_by_ids',
+])
+def test_hot_query_uses_indexes(hot_queries, name):
+    db_path, collected = hot_queries
+    statements = collected[name]
+    assert statements, f"{name} не выполнил ни одного запроса"
+
+    conn = sqlite3.connect(db_path)
+    try:
+        for statement in statements:
+            plan = conn.execute(f'EXPLAIN QUERY PLAN {statement}').fetchall()
+            scans = [row[3] for row in plan if row[3].startswith('SCAN')]
+            assert not scans, f"{name}: {scans} в\n{statement}"
+    finally:
+        conn.close()
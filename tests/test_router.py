@@ -0,0 +1,112 @@
+import asyncio
+from types import SimpleNamespace
+
+from utils.router import CallbackRouter
+
+
+class FakeQuery:
+    def __init__(self, data: str):
+        self.data = data
+        self.answers = []
+
+    async def answer(self, text=None, show_alert=False):
+        self.answers.append((text, show_alert))
+
+
+def dispatch(router: CallbackRouter, data: str):
+    query = FakeQuery(data)
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1))
+    context = SimpleNamespace(args=None)
+    handled = asyncio.run(router.dispatch(update, context))
+    return handled, query, context
+
+
+def test_router_answers_before_handler_by_default():
+    calls = []
+
+    async def handler(update, context):
+        calls.append(list(update.callback_query.answers))
+
+    router = CallbackRouter(lambda user_id: True)
+    router.add_prefix('manage_', handler)
+
+    handled, query, context = dispatch(router, 'manage_abc')
+
+    assert handled
+    assert calls == [[(None, False)]]
+    assert context.args == ['abc']
+
+
+def test_route_without_answer_lets_handler_show_toast():
+    async def handler(update, context):
+        await update.callback_query.answer('🎉 Вы участвуете!')
+
+    router = CallbackRouter(lambda user_id: True)
+    router.add_prefix('participate_', handler, answer=False)
+
+    handled, query, _ = dispatch(router, 'participate_abc')
+
+    assert handled
+    assert query.answers == [('🎉 Вы участвуете!', False)]
+
+
+def test_longest_prefix_wins_and_admin_only_is_enforced():
+    calls = []
+
+    async def publish(update, context):
+        calls.append('publish')
+
+    async def publish_instant(update, context):
+        calls.append('publish_instant')
+
+    router = CallbackRouter(lambda user_id: False)
+    router.add_prefix('publish_', publish)
+    router.add_prefix('publish_instant_', publish_instant)
+    router.add_prefix('draw_', publish, admin_only=True)
+
+    dispatch(router, 'publish_instant_abc')
+    _, denied, _ = dispatch(router, 'draw_abc')
+
+    assert calls == ['publish_instant']
+    assert denied.answers == [("❌ У вас нет прав администратора!", True)]
+
+
+def test_statistics_button_is_routed_to_admin_statistics():
+    from handlers.admin import AdminHandlers
+
+    admin = AdminHandlers(db_manager=None, runtime=None)
+    router = CallbackRouter(lambda user_id: True)
+    admin.register_routes(router)
+
+    route, arg = router.resolve('statistics')
+
+    assert route.handler == admin.show_statistics
+    assert route.admin_only and arg is None
+
+
+def test_statistics_screen_shows_giveaway_cache_stats():
+    from handlers.admin import AdminHandlers
+    from utils.cache import TTLCache
+
+    cache = TTLCache(100, 60)
+    cache.set('a', {})
+    cache.get('a')
+    cache.get('b')
+
+    class FakeQueries:
+        async def get_statistics(self, admin_id):
+            return {'total_giveaways': 1, 'active_giveaways': 1, 'finished_giveaways': 0,
+                    'total_participants': 3, 'avg_participants': 3}
+
+    class EditableQuery(FakeQuery):
+        async def edit_message_text(self, text, **kwargs):
+            self.text = text
+
+    admin = AdminHandlers(db_manager=SimpleNamespace(giveaway_cache=cache), runtime=None)
+    admin.queries = FakeQueries()
+    query = EditableQuery('statistics')
+    update = SimpleNamespace(callback_query=query, effective_user=SimpleNamespace(id=1))
+
+    asyncio.run(admin.show_statistics(update, SimpleNamespace(args=None)))
+
+    assert 'Кэш розыгрышей: 1/100, попаданий 50% (1 из 2)' in query.text
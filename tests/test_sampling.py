@@ -0,0 +1,145 @@
+import math
+import random
+from array import array
+from collections import Counter
+from itertools import permutations
+
+import pytest
+
+from utils import sampling
+from utils.sampling import (
+    participant_weight, sample_snapshot, weighted_sample, weighted_sample_indices,
+    weighted_sample_vectorized
+)
+
+WEIGHTS = [1.0, 2.0, 3.0, 4.0]
+TRIALS = 20000
+
+requires_numpy = pytest.mark.skipif(not sampling.vectorized_available(), reason='NumPy не установлен')
+
+
+def first_place_probabilities(weights):
+    total = sum(weights)
+    return {index: weight / total for index, weight in enumerate(weights)}
+
+
+def ordered_pair_probabilities(weights):
+    """Вероятности (первое, второе место) при последовательном выборе без возвращения"""
+    total = sum(weights)
+    return {
+        (first, second): weights[first] / total * weights[second] / (total - weights[first])
+        for first, second in permutations(range(len(weights)), 2)
+    }
+
+
+def assert_frequencies(counts: Counter, expected: dict, trials: int):
+    assert set(counts) <= set(expected)
+    for outcome, probability in expected.items():
+        frequency = counts[outcome] / trials
+        # 5 стандартных отклонений: при фиксированном seed тест детерминирован
+        tolerance = 5 * math.sqrt(probability * (1 - probability) / trials)
+        assert abs(frequency - probability) <= tolerance, (outcome, frequency, probability)
+
+
+def test_first_place_frequencies_are_proportional_to_weights():
+    rng = random.Random(1)
+    counts = Counter(weighted_sample_indices(WEIGHTS, 1, rng)[0] for _ in range(TRIALS))
+    assert_frequencies(counts, first_place_probabilities(WEIGHTS), TRIALS)
+
+
+def test_ordered_pairs_match_sequential_selection_without_replacement():
+    rng = random.Random(2)
+    counts = Counter(tuple(weighted_sample_indices(WEIGHTS, 2, rng)) for _ in range(TRIALS))
+    assert_frequencies(counts, ordered_pair_probabilities(WEIGHTS), TRIALS)
+
+
+def test_k_at_least_n_returns_every_positive_item():
+    rng = random.Random(3)
+    items = [('a', 1.0), ('b', 2.0), ('c', 0.5)]
+    assert sorted(weighted_sample(items, 3, rng)) == ['a', 'b', 'c']
+    assert sorted(weighted_sample(items, 10, rng)) == ['a', 'b', 'c']
+
+
+@pytest.mark.parametrize('k', [0, -1])
+def test_non_positive_k_returns_nothing(k):
+    assert weighted_sample([('a', 1.0)], k, random.Random(4)) == []
+
+
+def test_zero_and_negative_weights_are_never_selected():
+    rng = random.Random(5)
+    items = [('zero', 0.0), ('negative', -1.0), ('a', 1.0), ('b', 1.0)]
+    for _ in range(200):
+        assert set(weighted_sample(items, 4, rng)) == {'a', 'b'}
+
+
+def test_empty_input_returns_nothing():
+    assert weighted_sample([], 3, random.Random(6)) == []
+    assert weighted_sample(iter(()), 3, random.Random(6)) == []
+
+
+def test_accepts_generators():
+    items = ((index, 1.0) for index in range(100))
+    assert len(weighted_sample(items, 10, random.Random(7))) == 10
+
+
+def test_participant_weight():
+    assert participant_weight(0, True) == 1.0
+    assert participant_weight(3, False) == 1.0
+    assert participant_weight(2, True, multiplier=1.5) == 2.0
+    assert participant_weight(100, True, multiplier=1.5, max_multiplier=5.0) == 5.0
+
+
+def snapshot(referral_counts):
+    user_ids = array('q', range(100, 100 + len(referral_counts)))
+    return user_ids, array('q', referral_counts)
+
+
+def snapshot_probabilities(referral_counts, referral_enabled):
+    weights = [participant_weight(count, referral_enabled) for count in referral_counts]
+    return {100 + index: probability for index, probability in first_place_probabilities(weights).items()}
+
+
+@requires_numpy
+@pytest.mark.parametrize('referral_enabled', [True, False])
+def test_vectorized_first_place_matches_participant_weight(referral_enabled):
+    referral_counts = [0, 1, 2, 10]
+    user_ids, counts = snapshot(referral_counts)
+    winners = Counter(
+        weighted_sample_vectorized(user_ids, counts, 1, referral_enabled, seed=seed)[0]
+        for seed in range(TRIALS)
+    )
+    assert_frequencies(winners, snapshot_probabilities(referral_counts, referral_enabled), TRIALS)
+
+
+def test_python_snapshot_first_place_matches_participant_weight(monkeypatch):
+    monkeypatch.setattr(sampling, 'np', None)
+    referral_counts = [0, 1, 2, 10]
+    user_ids, counts = snapshot(referral_counts)
+    winners = Counter(sample_snapshot(user_ids, counts, 1, True, seed=seed)[0] for seed in range(TRIALS))
+    assert_frequencies(winners, snapshot_probabilities(referral_counts, True), TRIALS)
+
+
+@requires_numpy
+def test_vectorized_edge_cases():
+    user_ids, counts = snapshot([0, 1, 2])
+    assert weighted_sample_vectorized(user_ids, counts, 0, True, seed=1) == []
+    assert sorted(weighted_sample_vectorized(user_ids, counts, 10, True, seed=1)) == [100, 101, 102]
+    empty_ids, empty_counts = snapshot([])
+    assert weighted_sample_vectorized(empty_ids, empty_counts, 3, True, seed=1) == []
+
+
+@requires_numpy
+def test_sample_snapshot_uses_vectorized_path():
+    user_ids, counts = snapshot(list(range(50)))
+    assert sample_snapshot(user_ids, counts, 5, True, seed=8) == \
+        weighted_sample_vectorized(user_ids, counts, 5, True, seed=8)
+
+
+def test_same_seed_gives_same_result(monkeypatch):
+    user_ids, counts = snapshot(list(range(50)))
+    assert sample_snapshot(user_ids, counts, 5, True, seed=9) == sample_snapshot(user_ids, counts, 5, True, seed=9)
+
+    monkeypatch.setattr(sampling, 'np', None)
+    python_result = sample_snapshot(user_ids, counts, 5, True, seed=9)
+    assert python_result == sample_snapshot(user_ids, counts, 5, True, seed=9)
+    assert len(set(python_result)) == 5
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+from telegram import InlineKeyboardMarkup
+from telegram.error import BadRequest, Forbidden, RetryAfter
+from database.outbox import Outbox
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Ограничитель частоты: не более rate операций в секунду с запасом capacity"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        """Ожидание свободного токена"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _ChatState:
+    """Очередность и интервал отправки в один чат"""
+
+    __slots__ = ('lock', 'next_send_at')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.next_send_at = 0.0
+
+
+class Broadcaster:
+    """Рассылка сообщений из outbox с учетом ограничений Telegram.
+
+    Диспетчер забирает из базы готовые к отправке сообщения, несколько
+    отправителей доставляют их параллельно: общая частота ограничена
+    token bucket, в один чат - не чаще per_chat_interval, сообщения одному
+    чату уходят по порядку. RetryAfter приостанавливает всю рассылку на
+    указанное Telegram время, сетевые ошибки повторяются с экспоненциальной
+    задержкой, недоставляемые сообщения (бот заблокирован и т.п.) помечаются
+    как failed.
+    """
+
+    def __init__(self, outbox: Outbox, workers: int = 8, global_rate: float = 25.0,
+                 per_chat_interval: float = 1.0, max_attempts: int = 5,
+                 poll_interval: float = 5.0, retry_base_delay: float = 2.0,
+                 retention_days: int = 7, purge_interval: float = 3600.0):
+        self.outbox = outbox
+        self.workers_count = max(1, workers)
+        self.per_chat_interval = per_chat_interval
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.retry_base_delay = retry_base_delay
+        self.retention_days = retention_days
+        self.purge_interval = purge_interval
+
+        self.stats = {'sent': 0, 'failed': 0, 'retried': 0, 'rate_limited': 0}
+
+        self._bucket = TokenBucket(global_rate)
+        self._chats: Dict[int, _ChatState] = {}
+        self._paused_until = 0.0
+        self._next_purge_at = 0.0
+        self._bot = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._wake = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, bot):
+        """Запуск диспетчера и отправителей"""
+        if self.is_running:
+            return
+
+        self._bot = bot
+        self._queue = asyncio.Queue(maxsize=self.workers_count * 2)
+        self._stopping.clear()
+
+        resumed = await self.outbox.reset_in_flight()
+        if resumed:
+            logger.info(f"Рассылка: возвращено в очередь {resumed} незавершенных сообщений")
+
+        self._tasks = [asyncio.create_task(self._dispatcher())]
+        self._tasks += [asyncio.create_task(self._worker()) for _ in range(self.workers_count)]
+        logger.info(f"Рассылка запущена: {self.workers_count} отправителей")
+
+    async def stop(self):
+        """Остановка рассылки; неотправленные сообщения останутся в outbox.
+
+        Задачи не отменяются: диспетчер перестает забирать сообщения, а
+        отправители дожидаются окончания текущей доставки и ее фиксации в
+        outbox. Иначе доставленное сообщение могло остаться в 'sending' и
+        уйти повторно после перезапуска.
+        """
+        if not self.is_running:
+            return
+
+        self._stopping.set()
+        self._wake.set()
+
+        dispatcher, workers = self._tasks[0], self._tasks[1:]
+        await asyncio.gather(dispatcher, return_exceptions=True)
+
+        # Отправители пропускают оставшиеся в очереди сообщения и завершаются
+        for _ in workers:
+            await self._queue.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+        self._tasks = []
+
+        await self.outbox.reset_in_flight()
+        logger.info(f"Рассылка остановлена, статистика: {self.stats}")
+
+    async def send(self, messages: List[Dict], batch_id: Optional[str] = None,
+                   priority: int = 0) -> int:
+        """Постановка сообщений в outbox и пробуждение диспетчера"""
+        count = await self.outbox.enqueue(messages, batch_id, priority)
+        self.notify()
+        return count
+
+    def notify(self):
+        """Пробуждение диспетчера, если сообщения записаны в outbox в обход send"""
+        self._wake.set()
+
+    async def _dispatcher(self):
+        """Передача готовых сообщений из базы отправителям"""
+        while not self._stopping.is_set():
+            try:
+                self._wake.clear()
+                messages = await self.outbox.claim_due(self._queue.maxsize)
+
+                for message in messages:
+                    await self._queue.put(message)
+
+                await self._purge_if_due()
+
+                if not messages:
+                    await self._idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка диспетчера рассылки: {e}")
+                await self._wait_unless_stopping(self.poll_interval)
+
+    async def _purge_if_due(self):
+        """Периодическое удаление старых завершенных сообщений из outbox"""
+        if time.monotonic() < self._next_purge_at:
+            return
+
+        self._next_purge_at = time.monotonic() + self.purge_interval
+        purged = await self.outbox.purge_finished(self.retention_days)
+        if purged:
+            logger.info(f"Рассылка: удалено {purged} старых завершенных сообщений")
+
+    async def _idle(self):
+        """Ожидание новых сообщений или ближайшей повторной попытки"""
+        timeout = self.poll_interval
+        next_due_at = await self.outbox.next_due_at()
+        if next_due_at is not None:
+            timeout = min(timeout, max(0.05, next_due_at - time.time()))
+
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _wait_unless_stopping(self, delay: float):
+        """Пауза, прерываемая остановкой рассылки"""
+        if delay <= 0:
+            return
+
+        try:
+            await asyncio.wait_for(self._stopping.wait(), delay)
+        except asyncio.TimeoutError:
+            pass
+
+    def _chat_state(self, chat_id: int) -> _ChatState:
+        state = self._chats.get(chat_id)
+        if state is None:
+            if len(self._chats) > 10000:
+                self._prune_chats()
+            state = self._chats[chat_id] = _ChatState()
+        return state
+
+    def _prune_chats(self):
+        """Удаление состояний чатов, в которые давно ничего не отправлялось"""
+        now = time.monotonic()
+        for chat_id, state in list(self._chats.items()):
+            if not state.lock.locked() and state.next_send_at < now:
+                del self._chats[chat_id]
+
+    async def _worker(self):
+        """Отправитель"""
+        while True:
+            message = await self._queue.get()
+            try:
+                if message is None:
+                    return
+
+                # После остановки сообщения не отправляются: они остаются в
+                # 'sending' и возвращаются в очередь в stop()
+                if self._stopping.is_set():
+                    continue
+
+                # Замок берется сразу после get, поэтому сообщения одному чату идут по порядку
+                state = self._chat_state(message['chat_id'])
+                async with state.lock:
+                    await self._wait_unless_stopping(state.next_send_at - time.monotonic())
+                    await self._wait_unless_stopping(self._paused_until - time.monotonic())
+                    if self._stopping.is_set():
+                        continue
+
+                    await self._bucket.acquire()
+                    await self._deliver(message)
+                    state.next_send_at = time.monotonic() + self.per_chat_interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка отправителя рассылки: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, message: Dict):
+        """Отправка одного сообщения и фиксация результата в outbox"""
+        reply_markup = None
+        if message.get('reply_markup'):
+            reply_markup = InlineKeyboardMarkup.de_json(json.loads(message['reply_markup']), self._bot)
+
+        try:
+            await self._bot.send_message(
+                message['chat_id'],
+                message['text'],
+                parse_mode=message.get('parse_mode'),
+                reply_markup=reply_markup
+            )
+        except RetryAfter as e:
+            retry_after = float(getattr(e.retry_after, 'total_seconds', lambda: e.retry_after)())
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self.stats['rate_limited'] += 1
+            logger.warning(f"Рассылка: лимит Telegram, пауза {retry_after} с")
+            await self.outbox.reschedule(message['id'], retry_after, str(e), count_attempt=False)
+        except (Forbidden, BadRequest) as e:
+            # Пользователь заблокировал бота, чат не найден и т.п. - повтор не поможет
+            self.stats['failed'] += 1
+            logger.warning(f"Рассылка: сообщение {message['id']} в {message['chat_id']} не доставлено: {e}")
+            await self.outbox.mark_failed(message['id'], str(e))
+        except Exception as e:
+            attempts = message.get('attempts', 0) + 1
+            if attempts >= self.max_attempts:
+                self.stats['failed'] += 1
+                logger.error(f"Рассылка: сообщение {message['id']} не доставлено после {attempts} попыток: {e}")
+                await self.outbox.mark_failed(message['id'], str(e))
+            else:
+                self.stats['retried'] += 1
+                await self.outbox.reschedule(
+                    message['id'], self.retry_base_delay * 2 ** (attempts - 1), str(e)
+                )
+        else:
+            self.stats['sent'] += 1
+            await self.outbox.mark_sent(message['id'])
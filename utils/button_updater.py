@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Hashable, Optional
+from telegram import InlineKeyboardMarkup, Message
+from telegram.error import BadRequest, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingEdit:
+    """Последнее состояние кнопки одного сообщения"""
+
+    __slots__ = ('chat_id', 'message_id', 'inline_message_id', 'reply_markup',
+                 'count', 'sent_count', 'next_edit_at')
+
+    def __init__(self, chat_id: Optional[int], message_id: Optional[int],
+                 inline_message_id: Optional[str]):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.inline_message_id = inline_message_id
+        self.reply_markup: Optional[InlineKeyboardMarkup] = None
+        self.count = -1
+        self.sent_count = -1
+        self.next_edit_at = 0.0
+
+    @property
+    def dirty(self) -> bool:
+        return self.count != self.sent_count
+
+
+class ButtonUpdater:
+    """Объединение обновлений счетчика на кнопке участия.
+
+    Обработчик нажатия только запоминает новое число участников, а фоновая
+    задача редактирует каждое сообщение не чаще одного раза в interval секунд
+    с последним известным значением. При всплеске участий вместо сотен
+    правок одного поста уходит одна правка за интервал.
+    """
+
+    def __init__(self, interval: float = 3.0):
+        self.interval = interval
+        self.stats = {'scheduled': 0, 'edited': 0, 'rate_limited': 0}
+
+        self._pending: Dict[Hashable, _PendingEdit] = {}
+        self._bot = None
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, bot):
+        """Запуск фоновой задачи"""
+        if self._task:
+            return
+
+        self._bot = bot
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка с отправкой накопленных обновлений"""
+        if not self._task:
+            return
+
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        for entry in list(self._pending.values()):
+            if entry.dirty:
+                await self._edit(entry)
+        self._pending.clear()
+
+    def schedule(self, message: Optional[Message], inline_message_id: Optional[str],
+                 reply_markup: InlineKeyboardMarkup, count: int):
+        """Запоминание нового значения счетчика для сообщения с кнопкой"""
+        if inline_message_id:
+            key = inline_message_id
+            chat_id = message_id = None
+        elif message:
+            key = (message.chat_id, message.message_id)
+            chat_id, message_id = key
+        else:
+            return
+
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = _PendingEdit(chat_id, message_id, inline_message_id)
+
+        # Параллельные участия могут вернуть счетчики не по порядку - храним наибольший
+        if count > entry.count:
+            entry.count = count
+            entry.reply_markup = reply_markup
+            self.stats['scheduled'] += 1
+            self._wake.set()
+
+    async def _run(self):
+        """Фоновая отправка правок"""
+        while True:
+            try:
+                self._wake.clear()
+                now = time.monotonic()
+                next_at = None
+
+                for key, entry in list(self._pending.items()):
+                    if not entry.dirty:
+                        # Сообщение давно не менялось - состояние больше не нужно
+                        if entry.next_edit_at <= now:
+                            del self._pending[key]
+                        continue
+
+                    if entry.next_edit_at <= now:
+                        await self._edit(entry)
+                        now = time.monotonic()
+
+                    if entry.dirty or entry.next_edit_at > now:
+                        next_at = entry.next_edit_at if next_at is None else min(next_at, entry.next_edit_at)
+
+                timeout = None if next_at is None else max(0.0, next_at - time.monotonic())
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка обновления кнопок участия: {e}")
+                await asyncio.sleep(self.interval)
+
+    async def _edit(self, entry: _PendingEdit):
+        """Правка кнопки одного сообщения"""
+        count = entry.count
+        entry.next_edit_at = time.monotonic() + self.interval
+
+        try:
+            await self._bot.edit_message_reply_markup(
+                chat_id=entry.chat_id,
+                message_id=entry.message_id,
+                inline_message_id=entry.inline_message_id,
+                reply_markup=entry.reply_markup
+            )
+            self.stats['edited'] += 1
+        except RetryAfter as e:
+            retry_after = float(getattr(e.retry_after, 'total_seconds', lambda: e.retry_after)())
+            entry.next_edit_at = time.monotonic() + retry_after
+            self.stats['rate_limited'] += 1
+            return
+        except BadRequest as e:
+            if 'not modified' not in str(e).lower():
+                logger.warning(f"Не удалось обновить кнопку: {e}")
+        except Exception as e:
+            logger.warning(f"Не удалось обновить кнопку: {e}")
+
+        entry.sent_count = count
@@ -0,0 +1,106 @@
+import io
+from datetime import datetime
+from typing import List, Tuple
+from PIL import Image, ImageDraw, ImageFont
+
+WIDTH, HEIGHT = 960, 480
+MARGIN_LEFT, MARGIN_RIGHT, MARGIN_TOP, MARGIN_BOTTOM = 70, 30, 30, 60
+
+BACKGROUND = (255, 255, 255)
+GRID = (230, 230, 235)
+AXIS = (120, 120, 130)
+BARS = (170, 200, 245)
+LINE = (40, 90, 200)
+TEXT = (60, 60, 70)
+
+
+def _load_font(size: int) -> ImageFont.ImageFont:
+    try:
+        return ImageFont.truetype('DejaVuSans.ttf', size)
+    except OSError:
+        return ImageFont.load_default()
+
+
+def _nice_step(max_value: int, ticks: int = 5) -> int:
+    """Шаг делений оси: 1, 2, 5 x 10^n"""
+    raw = max(1, max_value) / ticks
+    magnitude = 10 ** (len(str(int(raw))) - 1)
+    for multiplier in (1, 2, 5, 10):
+        if raw <= multiplier * magnitude:
+            return multiplier * magnitude
+    return 10 * magnitude
+
+
+def render_growth_chart(hours: List[Tuple[datetime, int]], start_total: int = 0) -> bytes:
+    """График роста участников в PNG.
+
+    hours - непрерывный ряд часов [(начало часа, вступлений), ...],
+    start_total - участников до первого часа. Столбцы показывают вступления
+    за час, линия - общее число участников. Подписи только цифрами, без
+    кириллицы, чтобы не зависеть от установленных шрифтов.
+    Функция синхронная и выполняется в пуле потоков.
+    """
+    image = Image.new('RGB', (WIDTH, HEIGHT), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    font = _load_font(13)
+
+    plot_left, plot_right = MARGIN_LEFT, WIDTH - MARGIN_RIGHT
+    plot_top, plot_bottom = MARGIN_TOP, HEIGHT - MARGIN_BOTTOM
+    plot_width, plot_height = plot_right - plot_left, plot_bottom - plot_top
+
+    totals = []
+    total = start_total
+    for _, joins in hours:
+        total += joins
+        totals.append(total)
+
+    max_total = max(totals, default=start_total) or 1
+    max_joins = max((joins for _, joins in hours), default=0) or 1
+
+    # Сетка и ось общего числа участников
+    step = _nice_step(max_total)
+    axis_max = ((max_total + step - 1) // step) * step
+    for value in range(0, axis_max + 1, step):
+        y = plot_bottom - plot_height * value / axis_max
+        draw.line([(plot_left, y), (plot_right, y)], fill=GRID)
+        draw.text((plot_left - 8, y), str(value), fill=TEXT, font=font, anchor='rm')
+
+    draw.line([(plot_left, plot_top), (plot_left, plot_bottom), (plot_right, plot_bottom)], fill=AXIS)
+
+    if hours:
+        slot = plot_width / len(hours)
+        bar_width = max(1.0, slot * 0.7)
+        points = []
+
+        for index, ((hour, joins), value) in enumerate(zip(hours, totals)):
+            center = plot_left + slot * (index + 0.5)
+
+            if joins:
+                # Столбцы вступлений - в своем масштабе, до половины высоты
+                bar_height = plot_height * 0.5 * joins / max_joins
+                draw.rectangle(
+                    [center - bar_width / 2, plot_bottom - bar_height, center + bar_width / 2, plot_bottom - 1],
+                    fill=BARS
+                )
+
+            points.append((center, plot_bottom - plot_height * value / axis_max))
+
+        if len(points) > 1:
+            draw.line(points, fill=LINE, width=3)
+        else:
+            x, y = points[0]
+            draw.ellipse([x - 4, y - 4, x + 4, y + 4], fill=LINE)
+
+        # Подписи времени: не больше 8 штук
+        label_every = max(1, len(hours) // 8)
+        for index in range(0, len(hours), label_every):
+            center = plot_left + slot * (index + 0.5)
+            draw.line([(center, plot_bottom), (center, plot_bottom + 4)], fill=AXIS)
+            draw.text((center, plot_bottom + 8), hours[index][0].strftime('%d.%m'),
+                      fill=TEXT, font=font, anchor='mt')
+            draw.text((center, plot_bottom + 24), hours[index][0].strftime('%H:00'),
+                      fill=TEXT, font=font, anchor='mt')
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=True)
+    return buffer.getvalue()
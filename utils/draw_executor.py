@@ -0,0 +1,40 @@
+import asyncio
+import functools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DrawExecutor:
+    """Пул процессов для тяжелых розыгрышей, чтобы не блокировать event loop бота"""
+
+    def __init__(self, max_workers: int = 1):
+        self.max_workers = max(1, max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            logger.info(f"Пул процессов для розыгрышей запущен: {self.max_workers}")
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Выполнение функции в отдельном процессе.
+
+        Аргументы передаются через pickle, поэтому снимок участников лучше
+        передавать компактными массивами (array), а не списками словарей.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        """Остановка пула процессов"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            logger.info("Пул процессов для розыгрышей остановлен")
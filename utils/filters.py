@@ -0,0 +1,14 @@
+from telegram import Update
+from telegram.ext import filters
+
+
+class AdminFilter(filters.UpdateFilter):
+    """Фильтр обновлений от администраторов по списку в памяти DatabaseManager"""
+
+    def __init__(self, db_manager):
+        super().__init__(name='AdminFilter')
+        self.db = db_manager
+
+    def filter(self, update: Update) -> bool:
+        user = update.effective_user
+        return bool(user) and self.db.is_admin_cached(user.id)
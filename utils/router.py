@@ -0,0 +1,117 @@
+import logging
+import re
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+from telegram import Update
+from telegram.ext import ContextTypes
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[Any]]
+
+GIVEAWAY_ID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}')
+
+
+def giveaway_id_arg(value: str) -> str:
+    """Аргумент маршрута - ID розыгрыша (uuid4)"""
+    if not GIVEAWAY_ID_RE.fullmatch(value):
+        raise ValueError(f"Некорректный ID розыгрыша: {value!r}")
+    return value
+
+
+class Route(NamedTuple):
+    """Маршрут callback_data"""
+    handler: Handler
+    admin_only: bool = False
+    # Преобразование аргумента (часть callback_data после префикса), например int
+    parser: Optional[Callable[[str], Any]] = None
+    # Дополнительные именованные аргументы обработчика
+    kwargs: Optional[Dict[str, Any]] = None
+    # False - обработчик сам отвечает на callback (например, всплывающим уведомлением)
+    answer: bool = True
+
+
+class _TrieNode:
+    __slots__ = ('children', 'route')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.route: Optional[Route] = None
+
+
+class CallbackRouter:
+    """Маршрутизация callback-запросов по таблице.
+
+    Точные значения (admin_menu) ищутся в словаре, префиксы (manage_<id>) -
+    в префиксном дереве по самому длинному совпадению, поэтому publish_instant_
+    не перекрывается publish_, а поиск занимает O(длины префикса). Права
+    администратора проверяются только для маршрутов с admin_only. Аргумент
+    (остаток callback_data) передается обработчику в context.args. На callback
+    роутер отвечает сам до вызова обработчика, кроме маршрутов с answer=False.
+    """
+
+    def __init__(self, is_admin: Callable[[int], bool]):
+        self.is_admin = is_admin
+        self._exact: Dict[str, Route] = {}
+        self._root = _TrieNode()
+
+    def add_exact(self, data: str, handler: Handler, admin_only: bool = False,
+                  answer: bool = True, **kwargs):
+        """Маршрут для точного значения callback_data"""
+        if data in self._exact:
+            raise ValueError(f"Маршрут {data!r} уже зарегистрирован")
+        self._exact[data] = Route(handler, admin_only, None, kwargs or None, answer)
+
+    def add_prefix(self, prefix: str, handler: Handler, admin_only: bool = False,
+                   parser: Optional[Callable[[str], Any]] = None, answer: bool = True, **kwargs):
+        """Маршрут для callback_data вида <prefix><аргумент>"""
+        node = self._root
+        for char in prefix:
+            node = node.children.setdefault(char, _TrieNode())
+
+        if node.route is not None:
+            raise ValueError(f"Маршрут {prefix!r} уже зарегистрирован")
+        node.route = Route(handler, admin_only, parser, kwargs or None, answer)
+
+    def resolve(self, data: str) -> Optional[Tuple[Route, Optional[str]]]:
+        """Маршрут и аргумент для callback_data или None"""
+        route = self._exact.get(data)
+        if route is not None:
+            return route, None
+
+        node = self._root
+        match = None
+        for index, char in enumerate(data):
+            node = node.children.get(char)
+            if node is None:
+                break
+            if node.route is not None and index + 1 < len(data):
+                match = (node.route, data[index + 1:])
+
+        return match
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+        """Ответ на callback и вызов обработчика; False, если маршрут не найден"""
+        query = update.callback_query
+        resolved = self.resolve(query.data or '')
+        if resolved is None:
+            return False
+
+        route, argument = resolved
+
+        args = []
+        if argument is not None:
+            try:
+                args.append(route.parser(argument) if route.parser else argument)
+            except (TypeError, ValueError):
+                logger.warning(f"Некорректный аргумент callback {query.data!r}")
+                return False
+
+        if route.admin_only and not self.is_admin(update.effective_user.id):
+            await query.answer("❌ У вас нет прав администратора!", show_alert=True)
+            return True
+
+        if route.answer:
+            await query.answer()
+        context.args = args
+        await route.handler(update, context, **(route.kwargs or {}))
+        return True
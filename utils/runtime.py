@@ -0,0 +1,32 @@
+from typing import Optional
+from telegram import User
+from utils.broadcast import Broadcaster
+from utils.button_updater import ButtonUpdater
+
+
+class BotRuntime:
+    """Общее состояние бота, определяемое один раз при запуске.
+
+    Передается обработчикам вместо повторных запросов к Bot API
+    (например, get_me для построения реферальных ссылок).
+    """
+
+    def __init__(self, broadcaster: Broadcaster, button_updater: ButtonUpdater):
+        self.broadcaster = broadcaster
+        self.button_updater = button_updater
+        self.bot_id: Optional[int] = None
+        self.bot_username: Optional[str] = None
+        self._referral_prefix: Optional[str] = None
+
+    def set_bot_identity(self, bot_user: User):
+        """Сохранение данных бота, полученных через get_me при запуске"""
+        self.bot_id = bot_user.id
+        self.bot_username = bot_user.username
+        self._referral_prefix = f"https://t.me/{bot_user.username}?start=ref_"
+
+    def referral_link(self, giveaway_id: str, user_id: int) -> str:
+        """Реферальная ссылка участника (формат как у generate_referral_link)"""
+        if self._referral_prefix is None:
+            raise RuntimeError("Данные бота еще не получены")
+
+        return f"{self._referral_prefix}{giveaway_id}_{user_id}"
@@ -0,0 +1,119 @@
+import heapq
+import math
+import random
+from array import array
+from typing import Iterable, List, Optional, Sequence, Tuple, TypeVar
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+T = TypeVar('T')
+
+
+def participant_weight(referral_count: int, referral_enabled: bool,
+                       multiplier: float = 1.5, max_multiplier: float = 5.0) -> float:
+    """Вес участника с учетом приглашенных друзей"""
+    if not referral_enabled or not referral_count or referral_count <= 0:
+        return 1.0
+
+    return min(1.0 + referral_count * (multiplier - 1.0), max_multiplier)
+
+
+def weighted_sample(items: Iterable[Tuple[T, float]], k: int,
+                    rng: Optional[random.Random] = None) -> List[T]:
+    """Взвешенная выборка k элементов без возвращения (Efraimidis–Spirakis).
+
+    Каждому элементу с весом w назначается ключ u ** (1 / w), где u равномерно
+    распределено на (0, 1), и выбираются k наибольших ключей. Вероятность
+    оказаться первым пропорциональна весу, далее - как при последовательном
+    выборе без возвращения. Работает за O(N log k) на одном проходе по items,
+    поэтому принимает и генераторы. Ключ считается в логарифмах: log(u) / w.
+    Элементы с неположительным весом не выбираются. Результат упорядочен
+    по месту: первый элемент - победитель первого места.
+    """
+    if k <= 0:
+        return []
+
+    rng = rng or random
+
+    def keyed():
+        for index, (item, weight) in enumerate(items):
+            if weight <= 0:
+                continue
+            # 1.0 - random() лежит в (0, 1], log определен
+            yield math.log(1.0 - rng.random()) / weight, index, item
+
+    return [item for _, _, item in heapq.nlargest(k, keyed())]
+
+
+def weighted_sample_indices(weights: Sequence[float], k: int,
+                            rng: Optional[random.Random] = None) -> List[int]:
+    """Индексы k элементов, выбранных по весам без возвращения"""
+    return weighted_sample(((index, weight) for index, weight in enumerate(weights)), k, rng)
+
+
+def vectorized_available() -> bool:
+    """Доступен ли векторизованный режим розыгрыша (установлен NumPy)"""
+    return np is not None
+
+
+def weighted_sample_vectorized(user_ids: array, referral_counts: array, k: int,
+                               referral_enabled: bool, multiplier: float = 1.5,
+                               max_multiplier: float = 5.0, seed: Optional[int] = None) -> List[int]:
+    """Векторизованный вариант weighted_sample для больших розыгрышей.
+
+    Принимает компактные массивы user_id и referral_count (array('q')),
+    считает веса и ключи Efraimidis–Spirakis средствами NumPy и возвращает
+    user_id победителей по местам. При одинаковом seed результат повторяем.
+    """
+    ids = np.frombuffer(user_ids, dtype=np.int64)
+    counts = np.frombuffer(referral_counts, dtype=np.int64)
+
+    if k <= 0 or ids.size == 0:
+        return []
+
+    if referral_enabled:
+        weights = np.where(
+            counts > 0,
+            np.minimum(1.0 + counts * (multiplier - 1.0), max_multiplier),
+            1.0
+        )
+    else:
+        weights = np.ones(ids.size)
+
+    rng = np.random.default_rng(seed)
+    # 1.0 - random() лежит в (0, 1], log определен
+    keys = np.log1p(-rng.random(ids.size))
+    positive = weights > 0
+    keys[positive] /= weights[positive]
+    keys[~positive] = -np.inf
+
+    k = min(k, int(np.count_nonzero(positive)))
+    if k == 0:
+        return []
+
+    top = np.argpartition(keys, ids.size - k)[ids.size - k:]
+    top = top[np.argsort(-keys[top], kind='stable')]
+    return ids[top].tolist()
+
+
+def sample_snapshot(user_ids: array, referral_counts: array, k: int,
+                    referral_enabled: bool, multiplier: float = 1.5,
+                    max_multiplier: float = 5.0, seed: Optional[int] = None) -> List[int]:
+    """Выбор user_id победителей по снимку участников.
+
+    Использует NumPy, если он установлен, иначе чистый Python с тем же seed.
+    Функция не зависит от состояния бота и может выполняться в другом процессе.
+    """
+    if vectorized_available():
+        return weighted_sample_vectorized(
+            user_ids, referral_counts, k, referral_enabled, multiplier, max_multiplier, seed
+        )
+
+    weighted_ids = (
+        (user_id, participant_weight(referral_count, referral_enabled, multiplier, max_multiplier))
+        for user_id, referral_count in zip(user_ids, referral_counts)
+    )
+    return weighted_sample(weighted_ids, k, random.Random(seed))
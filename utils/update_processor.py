@@ -0,0 +1,83 @@
+import asyncio
+import inspect
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+from telegram.ext import BaseUpdateProcessor
+
+
+class KeyedLocks:
+    """Замки по ключу; запись удаляется, когда замок никому не нужен"""
+
+    def __init__(self):
+        self._locks: Dict[Hashable, List] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    async def acquire(self, key: Hashable):
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+
+        entry[1] += 1
+        try:
+            await entry[0].acquire()
+        except BaseException:
+            self._release_ref(key, entry)
+            raise
+
+    def release(self, key: Hashable):
+        entry = self._locks[key]
+        entry[0].release()
+        self._release_ref(key, entry)
+
+    def _release_ref(self, key: Hashable, entry: List):
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._locks[key]
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка по ключам.
+
+    Обновления с общим ключом (например, от одного пользователя) выполняются
+    строго по очереди, остальные - параллельно, не более max_concurrent_updates
+    одновременно. Ключи возвращает key_func; замки берутся в порядке ключей
+    до занятия слота, поэтому очередь одного пользователя не занимает слоты
+    других.
+    """
+
+    def __init__(self, max_concurrent_updates: int,
+                 key_func: Callable[[object], List[Hashable]]):
+        super().__init__(max_concurrent_updates)
+        self.key_func = key_func
+        self.locks = KeyedLocks()
+
+    # Переопределяет final-метод базового класса: замки по ключам нужно взять
+    # до семафора, иначе ждущие обновления занимали бы слоты параллельности
+    async def process_update(self, update: object, coroutine: Awaitable[Any]) -> None:  # type: ignore[misc]
+        keys = self.key_func(update)
+        acquired = []
+
+        try:
+            for key in keys:
+                await self.locks.acquire(key)
+                acquired.append(key)
+
+            await super().process_update(update, coroutine)
+        finally:
+            for key in reversed(acquired):
+                self.locks.release(key)
+
+            # Обработка отменена до запуска обработчика
+            if inspect.iscoroutine(coroutine) and \
+                    inspect.getcoroutinestate(coroutine) == inspect.CORO_CREATED:
+                coroutine.close()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass